@@ -9,6 +9,7 @@ from .tools import (
     export_session_study_plan,
     read_session_collaboration_trace,
     read_session_output_artifacts,
+    read_planning_bundle,
     read_planning_state,
     review_session_plan,
     read_estimation_state,
@@ -18,6 +19,7 @@ from .tools import (
     register_session_courses,
     register_session_files,
     record_session_collaboration_event,
+    record_session_collaboration_events,
     run_simple_study_planner,
 )
 
@@ -37,10 +39,12 @@ ingestion_agent = Agent(
         "(2) call register_session_files using file paths, "
         "(3) call map_session_files_to_courses, "
         "(4) call ingest_session_documents, "
-        "(5) call read_ingestion_state, "
-        "(6) call read_session_collaboration_trace, then summarize course-by-course topic evidence "
-        "and mapping quality. "
-        "Do not claim ingestion is complete unless ingest_session_documents result says so."
+        "(5) call read_ingestion_state and read_session_collaboration_trace together "
+        "in one response (they are independent read-only calls), "
+        "then summarize course-by-course topic evidence and mapping quality. "
+        "Do not claim ingestion is complete unless ingest_session_documents result says so. "
+        "When recording more than one collaboration event, use "
+        "record_session_collaboration_events once instead of repeated single calls."
     ),
     tools=[
         register_session_courses,
@@ -51,6 +55,7 @@ ingestion_agent = Agent(
         read_ingestion_state,
         read_session_collaboration_trace,
         record_session_collaboration_event,
+        record_session_collaboration_events,
     ],
     output_key="ingestion_output",
 )
@@ -62,8 +67,9 @@ estimation_agent = Agent(
     instruction=(
         "You are the EstimationAgent. "
         "Use tools to produce structured workload estimates from ingestion output. "
-        "Workflow: (1) call estimate_session_workload, (2) call read_estimation_state, "
-        "(3) call read_session_collaboration_trace, "
+        "Workflow: (1) call estimate_session_workload, "
+        "(2) call read_estimation_state and read_session_collaboration_trace together "
+        "in one response (they are independent read-only calls), "
         "then summarize total estimates and uncertainty flags. "
         "Return course/topic-level outputs with estimated_minutes, priority, and confidence."
     ),
@@ -72,6 +78,7 @@ estimation_agent = Agent(
         read_estimation_state,
         read_session_collaboration_trace,
         record_session_collaboration_event,
+        record_session_collaboration_events,
     ],
     output_key="estimation_output",
 )
@@ -85,20 +92,24 @@ planning_reviewer_agent = Agent(
         "Use tools to build a day-by-day study schedule from today through the last "
         "midterm date. "
         "Workflow: (1) call build_session_study_plan, (2) call review_session_plan, "
-        "(3) call export_session_study_plan, (4) call read_planning_state, "
-        "(5) call read_session_output_artifacts, "
-        "(6) call read_session_collaboration_trace, "
+        "(3) call export_session_study_plan, "
+        "(4) call read_planning_bundle, which returns planning state, output artifacts, "
+        "and the collaboration trace in one call, "
         "then summarize verdict, validation report, and "
-        "revision reasons if any."
+        "revision reasons if any. "
+        "Only call read_planning_state, read_session_output_artifacts, or "
+        "read_session_collaboration_trace individually when you need to refresh one of them."
     ),
     tools=[
         build_session_study_plan,
         review_session_plan,
         export_session_study_plan,
+        read_planning_bundle,
         read_planning_state,
         read_session_output_artifacts,
         read_session_collaboration_trace,
         record_session_collaboration_event,
+        record_session_collaboration_events,
     ],
     output_key="planning_output",
 )
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-import json
 from datetime import UTC, datetime
-from pathlib import Path
 from typing import Any
 
-from .settings import get_settings
-
-SETTINGS = get_settings()
+from .storage import (
+    append_events,
+    events_newest_first,
+    read_state,
+    session_dir,
+    state_path,
+)
 
 ALLOWED_EVENT_TYPES = {"invoke", "handoff", "review", "revision", "complete", "error"}
 
@@ -16,76 +18,113 @@ def _now_iso() -> str:
     return datetime.now(tz=UTC).isoformat()
 
 
-def _session_dir(session_id: str) -> Path:
-    return SETTINGS.artifacts_dir / "sessions" / session_id
-
-
-def _state_path(session_id: str) -> Path:
-    return _session_dir(session_id) / "state.json"
+def _load_state(session_id: str) -> dict[str, Any]:
+    path = state_path(session_id)
+    try:
+        return read_state(path)
+    except FileNotFoundError as exc:
+        raise ValueError(f"Session state not found: {path}") from exc
 
 
-def _load_state(session_id: str) -> dict[str, Any]:
-    path = _state_path(session_id)
-    if not path.exists():
-        raise ValueError(f"Session state not found: {path}")
-    return json.loads(path.read_text(encoding="utf-8"))
-
-
-def _save_state(session_id: str, state: dict[str, Any]) -> None:
-    session_dir = _session_dir(session_id)
-    session_dir.mkdir(parents=True, exist_ok=True)
-    state["updated_at"] = _now_iso()
-    _state_path(session_id).write_text(
-        json.dumps(state, indent=2, ensure_ascii=True),
-        encoding="utf-8",
-    )
+def _append_session_events(session_id: str, events: list[dict[str, Any]]) -> None:
+    # The session directory is created together with state.json, so a missing
+    # directory surfaces here as FileNotFoundError; no separate exists() check.
+    try:
+        append_events(session_dir(session_id), events)
+    except FileNotFoundError as exc:
+        raise ValueError(f"Session state not found: {state_path(session_id)}") from exc
 
 
-def record_collaboration_event(
+def _build_event(
     session_id: str,
     agent_name: str,
     event_type: str,
     summary: str,
     artifact_refs: list[str] | None = None,
 ) -> dict[str, Any]:
-    state = _load_state(session_id)
     normalized_type = event_type.strip().lower()
     if normalized_type not in ALLOWED_EVENT_TYPES:
         raise ValueError(
             f"Invalid event_type '{event_type}'. Allowed: {sorted(ALLOWED_EVENT_TYPES)}."
         )
-    event = {
+    return {
         "timestamp": _now_iso(),
         "session_id": session_id,
         "agent_name": agent_name.strip() or "UnknownAgent",
         "event_type": normalized_type,
         "summary": summary.strip(),
-        "artifact_refs": sorted(set(artifact_refs or [])),
+        "artifact_refs": list(dict.fromkeys(artifact_refs or [])),
     }
-    state.setdefault("events", []).append(event)
-    _save_state(session_id, state)
+
+
+def record_collaboration_event(
+    session_id: str,
+    agent_name: str,
+    event_type: str,
+    summary: str,
+    artifact_refs: list[str] | None = None,
+) -> dict[str, Any]:
+    event = _build_event(session_id, agent_name, event_type, summary, artifact_refs)
+    _append_session_events(session_id, [event])
     return {"session_id": session_id, "event": event}
 
 
-def read_collaboration_trace(
+def record_collaboration_events(
+    session_id: str,
+    events: list[dict[str, Any]],
+) -> dict[str, Any]:
+    # Validate everything up front so a bad entry does not leave a partial batch.
+    built = [
+        _build_event(
+            session_id,
+            str(item.get("agent_name", "")),
+            str(item.get("event_type", "")),
+            str(item.get("summary", "")),
+            item.get("artifact_refs"),
+        )
+        for item in events
+    ]
+    _append_session_events(session_id, built)
+    return {"session_id": session_id, "recorded_events": len(built), "events": built}
+
+
+def collaboration_trace_payload(
+    state: dict[str, Any],
     session_id: str,
     limit: int = 100,
     event_types: list[str] | None = None,
 ) -> dict[str, Any]:
-    state = _load_state(session_id)
-    events = list(state.get("events", []))
+    total_events, newest_first = events_newest_first(session_dir(session_id), state)
     normalized_filter = {
         item.strip().lower()
         for item in (event_types or [])
         if item and item.strip().lower() in ALLOWED_EVENT_TYPES
     }
-    if normalized_filter:
-        events = [e for e in events if str(e.get("event_type", "")).lower() in normalized_filter]
-    if limit > 0:
-        events = events[-limit:]
+    # Walk back from the newest event and stop once `limit` matches are found.
+    events: list[dict[str, Any]] = []
+    for event in newest_first:
+        if normalized_filter and str(event.get("event_type", "")).lower() not in normalized_filter:
+            continue
+        events.append(event)
+        if limit > 0 and len(events) >= limit:
+            break
+    events.reverse()
     return {
         "session_id": session_id,
-        "total_events": len(state.get("events", [])),
+        "total_events": total_events,
         "returned_events": len(events),
         "events": events,
     }
+
+
+def read_collaboration_trace(
+    session_id: str,
+    limit: int = 100,
+    event_types: list[str] | None = None,
+) -> dict[str, Any]:
+    return collaboration_trace_payload(
+        _load_state(session_id),
+        session_id,
+        limit=limit,
+        event_types=event_types,
+    )
@@ -1,58 +1,65 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
 
-from google import genai
 from google.genai import types
 
+from .genai_client import get_client
 from .resilience import retry_with_backoff
 from .settings import get_settings
+from .storage import (
+    append_event,
+    ensure_session_dir,
+    read_cached,
+    read_events,
+    read_state,
+    session_dir,
+    state_path,
+    write_cached,
+    write_state,
+)
 
 SETTINGS = get_settings()
 
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+_PRIORITIES = ("low", "medium", "high")
+_MIN_MINUTES = 25
+_MAX_MINUTES = 240
+
 
 def _now_iso() -> str:
     return datetime.now(tz=UTC).isoformat()
 
 
-def _session_dir(session_id: str) -> Path:
-    return SETTINGS.artifacts_dir / "sessions" / session_id
-
-
-def _state_path(session_id: str) -> Path:
-    return _session_dir(session_id) / "state.json"
-
-
 def _load_state(session_id: str) -> dict[str, Any]:
-    path = _state_path(session_id)
-    if not path.exists():
-        raise ValueError(f"Session state not found: {path}")
-    return json.loads(path.read_text(encoding="utf-8"))
+    path = state_path(session_id)
+    try:
+        return read_state(path)
+    except FileNotFoundError as exc:
+        raise ValueError(f"Session state not found: {path}") from exc
 
 
 def _save_state(session_id: str, state: dict[str, Any]) -> None:
-    session_dir = _session_dir(session_id)
-    session_dir.mkdir(parents=True, exist_ok=True)
+    ensure_session_dir(session_id)
     state["updated_at"] = _now_iso()
-    _state_path(session_id).write_text(
-        json.dumps(state, indent=2, ensure_ascii=True),
-        encoding="utf-8",
-    )
+    write_state(state_path(session_id), state)
 
 
 def _append_event(
-    state: dict[str, Any],
     session_id: str,
     agent_name: str,
     event_type: str,
     summary: str,
     artifact_refs: list[str] | None = None,
 ) -> None:
-    state.setdefault("events", []).append(
+    append_event(
+        session_dir(session_id),
         {
             "timestamp": _now_iso(),
             "session_id": session_id,
@@ -60,41 +67,66 @@ def _append_event(
             "event_type": event_type,
             "summary": summary,
             "artifact_refs": artifact_refs or [],
-        }
+        },
     )
 
 
 def _priority_from_minutes(minutes: int) -> str:
-    if minutes >= 120:
-        return "high"
-    if minutes >= 70:
-        return "medium"
-    return "low"
+    return _PRIORITIES[(minutes >= 70) + (minutes >= 120)]
+
+
+def _clamp_minutes(minutes: float, min_minutes: int, max_minutes: int) -> int:
+    return int(min(max_minutes, max(min_minutes, minutes)))
+
+
+def _finalize_estimate(
+    minutes: float,
+    confidence: float,
+    priority: str,
+    rationale: str,
+) -> dict[str, Any]:
+    """Clamp raw model/heuristic values into the persisted estimate shape."""
+    clamped = _clamp_minutes(minutes, _MIN_MINUTES, _MAX_MINUTES)
+    priority = priority.lower().strip()
+    if priority not in _PRIORITIES:
+        priority = _priority_from_minutes(clamped)
+    return {
+        "estimated_minutes": clamped,
+        "priority": priority,
+        "confidence": round(max(0.0, min(1.0, confidence)), 2),
+        "rationale": rationale,
+    }
+
+
+def _count_words(text: str) -> int:
+    return sum(1 for _ in _WORD_RE.finditer(text))
 
 
 def _heuristic_estimate(topic: str, evidence_summary: str, source_count: int) -> dict[str, Any]:
-    words = max(1, len(re.findall(r"[A-Za-z0-9]+", topic)))
-    evidence_words = len(re.findall(r"[A-Za-z0-9]+", evidence_summary))
+    words = max(1, _count_words(topic))
+    evidence_words = _count_words(evidence_summary)
     base = 30 + (words * 8)
     evidence_factor = min(40, evidence_words * 2)
     source_factor = min(35, source_count * 7)
-    minutes = int(max(25, min(240, base + evidence_factor + source_factor)))
-    priority = _priority_from_minutes(minutes)
-    confidence = round(min(0.95, 0.45 + (source_count * 0.12) + (0.01 * min(20, evidence_words))), 2)
-    return {
-        "estimated_minutes": minutes,
-        "priority": priority,
-        "confidence": confidence,
-        "rationale": "Heuristic estimate from topic complexity and source coverage.",
-    }
+    confidence = min(0.95, 0.45 + (source_count * 0.12) + (0.01 * min(20, evidence_words)))
+    return _finalize_estimate(
+        base + evidence_factor + source_factor,
+        confidence,
+        "",
+        "Heuristic estimate from topic complexity and source coverage.",
+    )
 
 
-def _gemini_estimate(topic: str, evidence_summary: str, source_count: int) -> dict[str, Any]:
-    if not SETTINGS.google_api_key:
-        return _heuristic_estimate(topic, evidence_summary, source_count)
+def _estimate_cache_path(topic: str, evidence_summary: str, source_count: int) -> Path:
+    key = hashlib.blake2b(
+        f"{SETTINGS.model}|{topic}|{evidence_summary}|{source_count}".encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    return SETTINGS.artifacts_dir / "estimate_cache" / f"{key}.json"
+
 
-    client = genai.Client(api_key=SETTINGS.google_api_key)
-    prompt = (
+def _estimate_prompt(topic: str, evidence_summary: str, source_count: int) -> str:
+    return (
         "Estimate study effort for one midterm topic. Return strict JSON object only with keys: "
         "estimated_minutes (int), priority (high|medium|low), confidence (0-1 float), rationale.\n"
         f"Topic: {topic}\n"
@@ -102,46 +134,69 @@ def _gemini_estimate(topic: str, evidence_summary: str, source_count: int) -> di
         f"Source count: {source_count}\n"
         "Constraints: estimated_minutes between 25 and 240. Keep rationale under 20 words."
     )
+
+
+def _estimate_config() -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        temperature=0.1,
+        response_mime_type="application/json",
+    )
+
+
+def _parse_estimate(text: str | None) -> dict[str, Any]:
+    parsed = json.loads((text or "").strip())
+    rationale = str(parsed.get("rationale", "Model estimate")).strip()[:180]
+    return _finalize_estimate(
+        int(parsed.get("estimated_minutes", 60)),
+        float(parsed.get("confidence", 0.65)),
+        str(parsed.get("priority", "")),
+        rationale or "Model estimate",
+    )
+
+
+def _gemini_estimate(topic: str, evidence_summary: str, source_count: int) -> dict[str, Any]:
+    if not SETTINGS.google_api_key:
+        return _heuristic_estimate(topic, evidence_summary, source_count)
+
+    cache_path = _estimate_cache_path(topic, evidence_summary, source_count)
+    cached = read_cached(cache_path)
+    if cached is not None:
+        return cached
+
+    client = get_client()
+    prompt = _estimate_prompt(topic, evidence_summary, source_count)
+
     def _call() -> dict[str, Any]:
         resp = client.models.generate_content(
             model=SETTINGS.model,
             contents=prompt,
-            config=types.GenerateContentConfig(
-                temperature=0.1,
-                response_mime_type="application/json",
-            ),
+            config=_estimate_config(),
         )
-        raw = (resp.text or "").strip()
-        parsed = json.loads(raw)
-        minutes = int(parsed.get("estimated_minutes", 60))
-        minutes = int(max(25, min(240, minutes)))
-        priority = str(parsed.get("priority", _priority_from_minutes(minutes))).lower().strip()
-        if priority not in {"high", "medium", "low"}:
-            priority = _priority_from_minutes(minutes)
-        confidence = float(parsed.get("confidence", 0.65))
-        confidence = round(max(0.0, min(1.0, confidence)), 2)
-        rationale = str(parsed.get("rationale", "Model estimate")).strip()[:180]
-        return {
-            "estimated_minutes": minutes,
-            "priority": priority,
-            "confidence": confidence,
-            "rationale": rationale or "Model estimate",
-        }
+        return _parse_estimate(resp.text)
 
     try:
-        return retry_with_backoff(
+        estimate = retry_with_backoff(
             _call,
             max_retries=SETTINGS.max_gemini_retries,
             base_seconds=SETTINGS.retry_base_seconds,
         )
     except Exception:
         return _heuristic_estimate(topic, evidence_summary, source_count)
+    # Only model answers are cached; heuristic fallbacks are cheap and should be retried.
+    write_cached(cache_path, estimate)
+    return estimate
+
+
+def _estimate_all(jobs: list[tuple[str, str, int]]) -> list[dict[str, Any]]:
+    """Estimate (topic, evidence_summary, source_count) jobs concurrently, in input order."""
+    with ThreadPoolExecutor(max_workers=SETTINGS.max_gemini_concurrency) as ex:
+        return list(ex.map(lambda job: _gemini_estimate(*job), jobs))
 
 
 def estimate_workload(
     session_id: str,
-    min_minutes: int = 25,
-    max_minutes: int = 240,
+    min_minutes: int = _MIN_MINUTES,
+    max_minutes: int = _MAX_MINUTES,
     force_reprocess: bool = False,
 ) -> dict[str, Any]:
     state = _load_state(session_id)
@@ -159,8 +214,7 @@ def estimate_workload(
             "reused_existing": True,
         }
 
-    topic_estimates: list[dict[str, Any]] = []
-    uncertainty_flags: list[str] = []
+    rows: list[tuple[str, str, str, list[str]]] = []
     for row in ingestion_rows:
         topic = str(row.get("topic", "")).strip()
         course_id = str(row.get("course_id", "")).strip()
@@ -168,9 +222,26 @@ def estimate_workload(
         source_files = row.get("source_files", [])
         if not topic or not course_id:
             continue
-        estimate = _gemini_estimate(topic, evidence_summary, len(source_files))
-        minutes = int(max(min_minutes, min(max_minutes, estimate["estimated_minutes"])))
-        confidence = float(estimate["confidence"])
+        rows.append((course_id, topic, evidence_summary, source_files))
+
+    jobs = [
+        (topic, evidence_summary, len(source_files))
+        for _, topic, evidence_summary, source_files in rows
+    ]
+    # Shared topics repeat across courses; estimate each distinct input once.
+    unique_jobs = list(dict.fromkeys(jobs))
+    by_job = dict(zip(unique_jobs, _estimate_all(unique_jobs), strict=True))
+    estimates = [by_job[job] for job in jobs]
+
+    # Estimates already sit in [_MIN_MINUTES, _MAX_MINUTES]; only caller bounds need a re-clamp.
+    custom_bounds = (min_minutes, max_minutes) != (_MIN_MINUTES, _MAX_MINUTES)
+    topic_estimates: list[dict[str, Any]] = []
+    uncertainty_flags: list[str] = []
+    for (course_id, topic, _, source_files), estimate in zip(rows, estimates, strict=True):
+        minutes = estimate["estimated_minutes"]
+        if custom_bounds:
+            minutes = _clamp_minutes(minutes, min_minutes, max_minutes)
+        confidence = estimate["confidence"]
         if confidence < 0.6:
             uncertainty_flags.append(f"Low confidence estimate for {course_id}:{topic}")
 
@@ -180,7 +251,7 @@ def estimate_workload(
                 "topic": topic,
                 "estimated_minutes": minutes,
                 "priority": estimate["priority"],
-                "confidence": round(confidence, 2),
+                "confidence": confidence,
                 "rationale": estimate["rationale"],
                 "source_files": source_files,
             }
@@ -189,10 +260,9 @@ def estimate_workload(
     state["status"] = "planning"
     state["estimation_state"] = {
         "topic_estimates": topic_estimates,
-        "uncertainty_flags": sorted(set(uncertainty_flags)),
+        "uncertainty_flags": list(dict.fromkeys(uncertainty_flags)),
     }
     _append_event(
-        state,
         session_id=session_id,
         agent_name="EstimationAgent",
         event_type="complete",
@@ -215,5 +285,5 @@ def get_session_estimation_state(session_id: str) -> dict[str, Any]:
         "session_id": state.get("session_id", session_id),
         "status": state.get("status", ""),
         "estimation_state": state.get("estimation_state", {}),
-        "events": state.get("events", []),
+        "events": read_events(session_dir(session_id), state),
     }
@@ -1,14 +1,23 @@
 from __future__ import annotations
 
 import csv
-import json
+import os
+from collections import Counter
 from datetime import UTC, datetime
+from operator import itemgetter
 from pathlib import Path
 from typing import Any
 
-from .settings import get_settings
-
-SETTINGS = get_settings()
+from .collaboration import collaboration_trace_payload
+from .planning import planning_state_payload
+from .storage import (
+    append_event,
+    ensure_session_dir,
+    read_state,
+    session_dir,
+    state_path,
+    write_state,
+)
 
 CSV_COLUMNS = [
     "date",
@@ -20,46 +29,39 @@ CSV_COLUMNS = [
     "source_files",
     "status",
 ]
+_WRITE_BUFFER_BYTES = 1 << 20
+_ROW_SORT_KEY = itemgetter("date", "course", "topic", "task_description")
+_TABLE_FIELDS = itemgetter("date", "course", "topic", "task_description", "estimated_minutes")
+_CSV_FIELDS = itemgetter(*CSV_COLUMNS)
 
 
 def _now_iso() -> str:
     return datetime.now(tz=UTC).isoformat()
 
 
-def _session_dir(session_id: str) -> Path:
-    return SETTINGS.artifacts_dir / "sessions" / session_id
-
-
-def _state_path(session_id: str) -> Path:
-    return _session_dir(session_id) / "state.json"
-
-
 def _load_state(session_id: str) -> dict[str, Any]:
-    path = _state_path(session_id)
-    if not path.exists():
-        raise ValueError(f"Session state not found: {path}")
-    return json.loads(path.read_text(encoding="utf-8"))
+    path = state_path(session_id)
+    try:
+        return read_state(path)
+    except FileNotFoundError as exc:
+        raise ValueError(f"Session state not found: {path}") from exc
 
 
 def _save_state(session_id: str, state: dict[str, Any]) -> None:
-    session_dir = _session_dir(session_id)
-    session_dir.mkdir(parents=True, exist_ok=True)
+    ensure_session_dir(session_id)
     state["updated_at"] = _now_iso()
-    _state_path(session_id).write_text(
-        json.dumps(state, indent=2, ensure_ascii=True),
-        encoding="utf-8",
-    )
+    write_state(state_path(session_id), state)
 
 
 def _append_event(
-    state: dict[str, Any],
     session_id: str,
     agent_name: str,
     event_type: str,
     summary: str,
     artifact_refs: list[str] | None = None,
 ) -> None:
-    state.setdefault("events", []).append(
+    append_event(
+        session_dir(session_id),
         {
             "timestamp": _now_iso(),
             "session_id": session_id,
@@ -67,7 +69,7 @@ def _append_event(
             "event_type": event_type,
             "summary": summary,
             "artifact_refs": artifact_refs or [],
-        }
+        },
     )
 
 
@@ -91,38 +93,30 @@ def _normalize_rows(rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
                 "status": str(row.get("status", "planned")).strip() or "planned",
             }
         )
-    normalized.sort(key=lambda r: (r["date"], r["course"], r["topic"], r["task_description"]))
+    normalized.sort(key=_ROW_SORT_KEY)
     return normalized
 
 
 def _write_csv(path: Path, rows: list[dict[str, Any]]) -> None:
-    with path.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({key: row.get(key, "") for key in CSV_COLUMNS})
+    with path.open("w", encoding="utf-8", newline="", buffering=_WRITE_BUFFER_BYTES) as f:
+        # Normalized rows carry exactly CSV_COLUMNS, so a plain writer fed by itemgetter
+        # skips DictWriter's per-row key lookups in Python.
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        writer.writerows(map(_CSV_FIELDS, rows))
 
 
 def _coverage_lines(rows: list[dict[str, Any]], estimates: list[dict[str, Any]], courses: list[dict[str, Any]]) -> list[str]:
-    planned = {}
-    for row in rows:
-        c = row["course"]
-        planned[c] = planned.get(c, 0) + 1
-
-    est_by_course = {}
+    planned = Counter(row["course"] for row in rows)
     course_id_to_name = {c.get("course_id"): c.get("course_name") for c in courses}
-    for est in estimates:
-        c_name = course_id_to_name.get(est.get("course_id"), "")
-        if not c_name:
-            continue
-        est_by_course[c_name] = est_by_course.get(c_name, 0) + 1
+    est_by_course = Counter(course_id_to_name.get(est.get("course_id")) for est in estimates)
 
     lines: list[str] = []
     for course in sorted(course_id_to_name.values()):
         if not course:
             continue
-        est_count = est_by_course.get(course, 0)
-        plan_count = planned.get(course, 0)
+        est_count = est_by_course[course]
+        plan_count = planned[course]
         percent = 100 if est_count == 0 else int(min(100, round((plan_count / max(1, est_count)) * 100)))
         lines.append(f"- {course}: {percent}% estimated-topic representation in plan rows.")
     return lines
@@ -135,40 +129,35 @@ def _write_markdown(
     estimates: list[dict[str, Any]],
     warnings: list[str],
 ) -> None:
-    lines: list[str] = []
-    lines.append("# Exam Study Plan")
-    lines.append("")
-    lines.append("## Student Inputs")
-    if courses:
-        course_names = ", ".join(c.get("course_name", "") for c in courses if c.get("course_name"))
-        midterms = ", ".join(c.get("midterm_date", "") for c in courses if c.get("midterm_date"))
-        lines.append(f"- Courses: {course_names}")
-        lines.append(f"- Midterms: {midterms}")
-    else:
-        lines.append("- Courses: (none)")
-    lines.append("")
-
-    lines.append("## Planning Assumptions")
-    lines.append("- Study window starts at current session date and ends at last midterm date.")
-    lines.append("- Topic effort is based on estimation output and split into daily blocks.")
-    if warnings:
+    with path.open("w", encoding="utf-8", buffering=_WRITE_BUFFER_BYTES) as f:
+        f.write("# Exam Study Plan\n\n## Student Inputs\n")
+        if courses:
+            course_names = ", ".join(c.get("course_name", "") for c in courses if c.get("course_name"))
+            midterms = ", ".join(c.get("midterm_date", "") for c in courses if c.get("midterm_date"))
+            f.write(f"- Courses: {course_names}\n- Midterms: {midterms}\n")
+        else:
+            f.write("- Courses: (none)\n")
+        f.write("\n")
+
+        f.write(
+            "## Planning Assumptions\n"
+            "- Study window starts at current session date and ends at last midterm date.\n"
+            "- Topic effort is based on estimation output and split into daily blocks.\n"
+        )
         for w in warnings:
-            lines.append(f"- Warning: {w}")
-    lines.append("")
+            f.write(f"- Warning: {w}\n")
+        f.write("\n")
 
-    lines.append("## Day-by-Day Plan")
-    lines.append("| Date | Course | Topic | Task | Minutes |")
-    lines.append("|---|---|---|---|---|")
-    for row in rows:
-        lines.append(
-            f"| {row['date']} | {row['course']} | {row['topic']} | {row['task_description']} | {row['estimated_minutes']} |"
+        f.write("## Day-by-Day Plan\n| Date | Course | Topic | Task | Minutes |\n|---|---|---|---|---|\n")
+        f.writelines(
+            f"| {day} | {course} | {topic} | {task} | {minutes} |\n"
+            for day, course, topic, task, minutes in map(_TABLE_FIELDS, rows)
         )
-    lines.append("")
+        f.write("\n")
 
-    lines.append("## Coverage Check by Course")
-    lines.extend(_coverage_lines(rows=rows, estimates=estimates, courses=courses))
-    lines.append("")
-    path.write_text("\n".join(lines), encoding="utf-8")
+        f.write("## Coverage Check by Course\n")
+        for line in _coverage_lines(rows=rows, estimates=estimates, courses=courses):
+            f.write(f"{line}\n")
 
 
 def export_study_plan_outputs(session_id: str, overwrite: bool = True) -> dict[str, Any]:
@@ -178,12 +167,15 @@ def export_study_plan_outputs(session_id: str, overwrite: bool = True) -> dict[s
         raise ValueError("No planning_state.plan_rows found. Run planning/review first.")
 
     normalized_rows = _normalize_rows(plan_rows)
-    outputs_dir = _session_dir(session_id) / "outputs"
+    outputs_dir = session_dir(session_id) / "outputs"
     outputs_dir.mkdir(parents=True, exist_ok=True)
     csv_path = outputs_dir / "study_plan.csv"
     md_path = outputs_dir / "study_plan.md"
-    if not overwrite and (csv_path.exists() or md_path.exists()):
-        raise ValueError("Output files already exist and overwrite=False.")
+    if not overwrite:
+        with os.scandir(outputs_dir) as entries:
+            existing = {entry.name for entry in entries}
+        if csv_path.name in existing or md_path.name in existing:
+            raise ValueError("Output files already exist and overwrite=False.")
 
     _write_csv(csv_path, normalized_rows)
     _write_markdown(
@@ -199,7 +191,6 @@ def export_study_plan_outputs(session_id: str, overwrite: bool = True) -> dict[s
     state["artifacts"]["markdown_path"] = str(md_path)
     state["status"] = "completed"
     _append_event(
-        state,
         session_id=session_id,
         agent_name="CoordinatorAgent",
         event_type="complete",
@@ -215,13 +206,12 @@ def export_study_plan_outputs(session_id: str, overwrite: bool = True) -> dict[s
     }
 
 
-def read_output_artifacts(session_id: str) -> dict[str, Any]:
-    state = _load_state(session_id)
+def output_artifacts_payload(state: dict[str, Any], session_id: str) -> dict[str, Any]:
     artifacts = state.get("artifacts", {})
     csv_path = artifacts.get("csv_path", "")
     md_path = artifacts.get("markdown_path", "")
-    csv_exists = bool(csv_path) and Path(csv_path).exists()
-    md_exists = bool(md_path) and Path(md_path).exists()
+    csv_exists = bool(csv_path) and os.path.exists(csv_path)
+    md_exists = bool(md_path) and os.path.exists(md_path)
     return {
         "session_id": session_id,
         "artifacts": {
@@ -231,3 +221,18 @@ def read_output_artifacts(session_id: str) -> dict[str, Any]:
             "markdown_exists": md_exists,
         },
     }
+
+
+def read_output_artifacts(session_id: str) -> dict[str, Any]:
+    return output_artifacts_payload(_load_state(session_id), session_id)
+
+
+def get_session_planning_bundle(session_id: str, trace_limit: int = 100) -> dict[str, Any]:
+    """Planning state, output artifacts, and collaboration trace from a single state read."""
+    state = _load_state(session_id)
+    return {
+        "session_id": session_id,
+        "planning": planning_state_payload(state, session_id),
+        "outputs": output_artifacts_payload(state, session_id),
+        "collaboration_trace": collaboration_trace_payload(state, session_id, limit=trace_limit),
+    }
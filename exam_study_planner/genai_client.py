@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import threading
+
+from google import genai
+
+from .settings import get_settings
+
+SETTINGS = get_settings()
+
+_CLIENT: genai.Client | None = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> genai.Client:
+    """Return the process-wide Gemini client so HTTP connections are reused across calls."""
+    global _CLIENT
+    if _CLIENT is None:
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = genai.Client(api_key=SETTINGS.google_api_key)
+    return _CLIENT
@@ -1,36 +1,77 @@
 from __future__ import annotations
 
+import atexit
 import hashlib
 import json
+import multiprocessing
+import os
 import re
 import shutil
-import time
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import UTC, date, datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
 
-from google import genai
 from google.genai import types
 from pypdf import PdfReader
 
-from .resilience import retry_with_backoff
+from .genai_client import get_client
+from .resilience import TokenBucket, retry_with_backoff
 from .settings import get_settings
+from .storage import (
+    append_event,
+    ensure_session_dir,
+    read_cached,
+    read_events,
+    read_state,
+    session_dir,
+    state_path,
+    write_cached,
+    write_state,
+)
+
+try:
+    import fcntl
+except ImportError:  # Windows; _fast_copy falls back to shutil.copyfile.
+    fcntl = None
+
+try:
+    import fitz
+except ImportError:  # PyMuPDF is an optional, faster text backend; pypdf is the fallback.
+    fitz = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # pypdfium2 is a second optional C-backed backend, used when PyMuPDF is absent.
+    pdfium = None
+
+# Recorded with each file's chunk layout; extracted text differs between backends.
+_TEXT_BACKEND = "pymupdf" if fitz is not None else "pypdfium2" if pdfium is not None else "pypdf"
 
 SETTINGS = get_settings()
+# Bump when the extraction prompt changes so cached topics are not reused.
+_TOPIC_PROMPT_VERSION = "v1"
+# Chunking records written before these keys were tracked used the default character
+# limit and pypdf; assume that layout so their partial results still resume.
+_LEGACY_CHUNKING = {"max_chars_per_chunk": SETTINGS.max_chunk_chars, "text_backend": "pypdf"}
+
+_TITLE_RE = re.compile(r"\b[A-Z][A-Za-z0-9\-]{3,}(?:\s+[A-Z][A-Za-z0-9\-]{3,}){0,3}\b")
+_NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9\s]")
+_FENCE_RE = re.compile(r"^```json|^```|```$", re.MULTILINE)
+# Shared across extraction threads; GEMINI_RPM=0 leaves calls unthrottled.
+_RATE_LIMITER = TokenBucket(
+    rate=SETTINGS.gemini_rpm / 60.0,
+    capacity=SETTINGS.ingestion_concurrency,
+)
 
 
 def _now_iso() -> str:
     return datetime.now(tz=UTC).isoformat()
 
 
-def _session_dir(session_id: str) -> Path:
-    return SETTINGS.artifacts_dir / "sessions" / session_id
-
-
-def _state_path(session_id: str) -> Path:
-    return _session_dir(session_id) / "state.json"
-
-
 def _default_state(session_id: str) -> dict[str, Any]:
     now = _now_iso()
     return {
@@ -46,38 +87,33 @@ def _default_state(session_id: str) -> dict[str, Any]:
             "files": {},
             "course_topic_evidence": [],
         },
-        "events": [],
     }
 
 
 def _load_state(session_id: str) -> dict[str, Any]:
-    path = _state_path(session_id)
-    if not path.exists():
+    try:
+        return read_state(state_path(session_id))
+    except FileNotFoundError:
         state = _default_state(session_id)
         _save_state(session_id, state)
         return state
-    return json.loads(path.read_text(encoding="utf-8"))
 
 
 def _save_state(session_id: str, state: dict[str, Any]) -> None:
-    session_dir = _session_dir(session_id)
-    session_dir.mkdir(parents=True, exist_ok=True)
+    ensure_session_dir(session_id)
     state["updated_at"] = _now_iso()
-    _state_path(session_id).write_text(
-        json.dumps(state, indent=2, ensure_ascii=True),
-        encoding="utf-8",
-    )
+    write_state(state_path(session_id), state)
 
 
 def _append_event(
-    state: dict[str, Any],
     session_id: str,
     agent_name: str,
     event_type: str,
     summary: str,
     artifact_refs: list[str] | None = None,
 ) -> None:
-    state.setdefault("events", []).append(
+    append_event(
+        session_dir(session_id),
         {
             "timestamp": _now_iso(),
             "session_id": session_id,
@@ -85,16 +121,94 @@ def _append_event(
             "event_type": event_type,
             "summary": summary,
             "artifact_refs": artifact_refs or [],
-        }
+        },
     )
 
 
 def _sha256(path: Path) -> str:
-    hasher = hashlib.sha256()
-    with path.open("rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+    # file_digest runs the read/update loop in C and releases the GIL, so the
+    # thread pool in register_pdf_files hashes files in parallel.
+    with path.open("rb", buffering=0) as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+# Linux ioctl that clones a file's extents into another (btrfs, XFS, ...).
+_FICLONE = 0x40049409
+
+_HASH_CACHE_PATH = SETTINGS.artifacts_dir / "hash_cache.json"
+_HASH_CACHE_LOCK = threading.Lock()
+_persisted_hashes: dict[str, list[Any]] | None = None
+_hash_cache_dirty = False
+
+
+def _persisted_hash_cache() -> dict[str, list[Any]]:
+    """Path -> [size, mtime_ns, sha256], loaded once from artifacts/hash_cache.json."""
+    global _persisted_hashes
+    with _HASH_CACHE_LOCK:
+        if _persisted_hashes is None:
+            loaded = read_cached(_HASH_CACHE_PATH)
+            _persisted_hashes = loaded if isinstance(loaded, dict) else {}
+        return _persisted_hashes
+
+
+@lru_cache(maxsize=1024)
+def _sha256_cached(path_str: str, size: int, mtime_ns: int) -> str:
+    global _hash_cache_dirty
+    persisted = _persisted_hash_cache()
+    entry = persisted.get(path_str)
+    if entry and entry[0] == size and entry[1] == mtime_ns:
+        return entry[2]
+    checksum = _sha256(Path(path_str))
+    with _HASH_CACHE_LOCK:
+        persisted[path_str] = [size, mtime_ns, checksum]
+        _hash_cache_dirty = True
+    return checksum
+
+
+def _save_hash_cache() -> None:
+    """Persist new checksums, dropping entries for files that no longer exist."""
+    global _hash_cache_dirty
+    persisted = _persisted_hash_cache()
+    with _HASH_CACHE_LOCK:
+        if not _hash_cache_dirty:
+            return
+        for path_str in [p for p in persisted if not os.path.exists(p)]:
+            del persisted[path_str]
+        snapshot = dict(persisted)
+        _hash_cache_dirty = False
+    write_cached(_HASH_CACHE_PATH, snapshot)
+
+
+def _fast_copy(src: Path, dst: Path) -> None:
+    """
+    Copy src into the session as an independent file.
+
+    Uses a copy-on-write clone (FICLONE) where the filesystem supports it,
+    else a kernel-side copyfile. Never hardlinks: the stored copy must not
+    change when the user edits the original.
+    """
+    # Replace rather than truncate dst, which may be a hardlink to src from older sessions.
+    dst.unlink(missing_ok=True)
+    if fcntl is not None:
+        try:
+            with src.open("rb") as fsrc, dst.open("wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            return
+        except OSError:
+            # Different filesystems, no reflink support, or not Linux.
+            pass
+    shutil.copyfile(src, dst)
+
+
+def _inspect_pdf(raw_path: str) -> tuple[Path, int, str]:
+    input_path = Path(raw_path).expanduser().resolve()
+    if not input_path.exists():
+        raise FileNotFoundError(f"File not found: {input_path}")
+    if input_path.suffix.lower() != ".pdf":
+        raise ValueError(f"Only PDF files are supported: {input_path.name}")
+    stat = input_path.stat()
+    # Unchanged files (same path, size, and mtime) are not re-read.
+    return input_path, stat.st_size, _sha256_cached(str(input_path), stat.st_size, stat.st_mtime_ns)
 
 
 def _normalize_date(raw: str) -> str:
@@ -150,7 +264,6 @@ def register_courses(session_id: str, courses: list[dict[str, Any]]) -> dict[str
 
     state.setdefault("user_inputs", {})["courses"] = normalized
     _append_event(
-        state,
         session_id=session_id,
         agent_name="CoordinatorAgent",
         event_type="handoff",
@@ -172,7 +285,7 @@ def register_pdf_files(session_id: str, files: list[dict[str, Any]]) -> dict[str
     }
     """
     state = _load_state(session_id)
-    session_files_dir = _session_dir(session_id) / "files"
+    session_files_dir = session_dir(session_id) / "files"
     session_files_dir.mkdir(parents=True, exist_ok=True)
     registry = state.setdefault("file_registry", {})
 
@@ -184,15 +297,15 @@ def register_pdf_files(session_id: str, files: list[dict[str, Any]]) -> dict[str
     registered: list[dict[str, Any]] = []
     reused: list[dict[str, Any]] = []
 
-    for idx, entry in enumerate(files):
-        input_path = Path(str(entry.get("path", ""))).expanduser().resolve()
-        if not input_path.exists():
-            raise FileNotFoundError(f"File not found: {input_path}")
-        if input_path.suffix.lower() != ".pdf":
-            raise ValueError(f"Only PDF files are supported: {input_path.name}")
+    # Validation and hashing are independent per file; fan them out, then
+    # join into the registry in submission order so file ids stay stable.
+    inspected: list[tuple[Path, int, str]] = []
+    if files:
+        with ThreadPoolExecutor(max_workers=min(len(files), os.cpu_count() or 1)) as ex:
+            inspected = list(ex.map(_inspect_pdf, [str(entry.get("path", "")) for entry in files]))
+        _save_hash_cache()
 
-        size_bytes = input_path.stat().st_size
-        checksum = _sha256(input_path)
+    for entry, (input_path, size_bytes, checksum) in zip(files, inspected, strict=True):
         existing_id = checksum_index.get((checksum, size_bytes))
         if existing_id:
             reused.append(
@@ -207,7 +320,7 @@ def register_pdf_files(session_id: str, files: list[dict[str, Any]]) -> dict[str
         file_id = f"file_{len(registry) + 1:03d}"
         stored_name = f"{file_id}{input_path.suffix.lower()}"
         stored_path = session_files_dir / stored_name
-        shutil.copy2(input_path, stored_path)
+        _fast_copy(input_path, stored_path)
 
         file_meta = {
             "filename": input_path.name,
@@ -239,7 +352,6 @@ def register_pdf_files(session_id: str, files: list[dict[str, Any]]) -> dict[str
     if registered:
         state["status"] = "ingesting"
     _append_event(
-        state,
         session_id=session_id,
         agent_name="IngestionAgent",
         event_type="handoff",
@@ -273,11 +385,14 @@ def link_files_to_courses(session_id: str, mappings: list[dict[str, Any]]) -> di
     if not mappings:
         raise ValueError("At least one mapping item is required.")
 
-    by_filename = {meta.get("filename"): file_id for file_id, meta in registry.items()}
+    # Only needed when a mapping refers to a file by name; built on first use.
+    by_filename: dict[str, str] | None = None
     updated: list[str] = []
     for item in mappings:
         file_id = str(item.get("file_id", "")).strip()
         if not file_id:
+            if by_filename is None:
+                by_filename = {meta.get("filename"): fid for fid, meta in registry.items()}
             filename = str(item.get("filename", "")).strip()
             file_id = by_filename.get(filename, "")
         if file_id not in registry:
@@ -294,7 +409,6 @@ def link_files_to_courses(session_id: str, mappings: list[dict[str, Any]]) -> di
         updated.append(file_id)
 
     _append_event(
-        state,
         session_id=session_id,
         agent_name="IngestionAgent",
         event_type="handoff",
@@ -305,31 +419,207 @@ def link_files_to_courses(session_id: str, mappings: list[dict[str, Any]]) -> di
     return {"session_id": session_id, "updated_file_ids": sorted(set(updated))}
 
 
-def _extract_pages_text(reader: PdfReader, page_start: int, page_end: int, max_chars: int) -> str:
-    chunks: list[str] = []
+def _open_pdf_pages(pdf_path: Path) -> tuple[Any, list[Any]]:
+    """
+    Open a PDF once and return (document, pages).
+
+    PyMuPDF is used when installed, then pypdfium2, then pypdf. PyMuPDF pages
+    only hold a weak reference to their document, so callers keep the document
+    alive while using the pages.
+    """
+    if fitz is not None:
+        document = fitz.open(str(pdf_path))
+        return document, list(document)
+    if pdfium is not None:
+        document = pdfium.PdfDocument(str(pdf_path))
+        return document, [document[i] for i in range(len(document))]
+    document = PdfReader(str(pdf_path))
+    return document, list(document.pages)
+
+
+def _close_pdf(document: Any, pages: list[Any]) -> None:
+    """Release the native handles PyMuPDF and pypdfium2 hold; closes pypdf's file stream."""
+    if pdfium is not None and isinstance(document, pdfium.PdfDocument):
+        for page in pages:
+            page.close()
+    document.close()
+
+
+def _page_text(page: Any) -> str:
+    if fitz is not None and isinstance(page, fitz.Page):
+        return page.get_text("text") or ""
+    if pdfium is not None and isinstance(page, pdfium.PdfPage):
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range() or ""
+        finally:
+            textpage.close()
+    return page.extract_text() or ""
+
+
+def _normalized_page_text(page: Any) -> str:
+    # str.split() collapses and strips Unicode whitespace in one C-level pass.
+    return " ".join(_page_text(page).split())
+
+
+def _iter_pages_text(pages: list[Any], max_chars: int) -> Iterator[str]:
+    """Yield normalized page text, stopping as soon as max_chars is spent."""
     remaining = max_chars
-    for page_index in range(page_start, page_end):
-        text = reader.pages[page_index].extract_text() or ""
-        text = re.sub(r"\s+", " ", text).strip()
+    for page in pages:
+        text = _normalized_page_text(page)
         if not text:
             continue
-        if len(text) > remaining:
-            chunks.append(text[:remaining])
-            break
-        chunks.append(text)
+        if len(text) >= remaining:
+            yield text[:remaining]
+            return
+        yield text
         remaining -= len(text)
-        if remaining <= 0:
-            break
-    return "\n".join(chunks)
+
+
+def _extract_pages_text(pages: list[Any], max_chars: int) -> str:
+    return "\n".join(_iter_pages_text(pages, max_chars))
+
+
+_TEXT_POOL: ProcessPoolExecutor | None = None
+_TEXT_POOL_LOCK = threading.Lock()
+
+
+def _text_pool() -> ProcessPoolExecutor | None:
+    """Return the shared page-text process pool, or None when INGESTION_TEXT_WORKERS is 0."""
+    global _TEXT_POOL
+    if SETTINGS.ingestion_text_workers <= 0:
+        return None
+    with _TEXT_POOL_LOCK:
+        if _TEXT_POOL is None:
+            # Spawn rather than fork: the parent is running Gemini threads at this point.
+            _TEXT_POOL = ProcessPoolExecutor(
+                max_workers=SETTINGS.ingestion_text_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _TEXT_POOL
+
+
+@atexit.register
+def _shutdown_text_pool() -> None:
+    global _TEXT_POOL
+    with _TEXT_POOL_LOCK:
+        pool, _TEXT_POOL = _TEXT_POOL, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+# Per worker process: the one PDF it currently serves, as ((path, size, mtime_ns), document, pages).
+_worker_pdf: tuple[tuple[str, int, int], Any, list[Any]] | None = None
+
+
+def _worker_pdf_pages(path_str: str, size: int, mtime_ns: int) -> list[Any]:
+    """Return pages of the requested PDF, closing the previously open one when it changes."""
+    global _worker_pdf
+    key = (path_str, size, mtime_ns)
+    if _worker_pdf is None or _worker_pdf[0] != key:
+        if _worker_pdf is not None:
+            _close_pdf(_worker_pdf[1], _worker_pdf[2])
+            _worker_pdf = None
+        document, pages = _open_pdf_pages(Path(path_str))
+        _worker_pdf = (key, document, pages)
+    return _worker_pdf[2]
+
+
+def _extract_range_text(
+    path_str: str,
+    size: int,
+    mtime_ns: int,
+    start: int,
+    end: int,
+    max_chars: int,
+) -> str:
+    """Process-pool entry point: extract one chunk's text, reusing the worker's open PDF."""
+    pages = _worker_pdf_pages(path_str, size, mtime_ns)
+    return _extract_pages_text(pages[start:end], max_chars)
+
+
+_ChunkKey = tuple[int, str, int, int]
+
+
+def _iter_chunk_texts(
+    pages: list[Any],
+    file_id: str,
+    ranges: list[tuple[int, int]],
+    completed_ids: set[str],
+    max_chars: int,
+) -> Iterator[tuple[_ChunkKey, str]]:
+    for idx, (start, end) in enumerate(ranges):
+        chunk_id = f"{file_id}:{idx}"
+        if chunk_id in completed_ids:
+            continue
+        yield (idx, chunk_id, start, end), _extract_pages_text(pages[start:end], max_chars)
+
+
+def _iter_chunk_texts_in_pool(
+    text_pool: ProcessPoolExecutor,
+    pdf_path: Path,
+    file_id: str,
+    ranges: list[tuple[int, int]],
+    completed_ids: set[str],
+    max_chars: int,
+) -> Iterator[tuple[_ChunkKey, str]]:
+    """Like _iter_chunk_texts, but extracts up to two chunks per worker ahead in other processes."""
+    stat = pdf_path.stat()
+    window = 2 * SETTINGS.ingestion_text_workers
+    queue: deque[tuple[_ChunkKey, Future[str]]] = deque()
+    for idx, (start, end) in enumerate(ranges):
+        chunk_id = f"{file_id}:{idx}"
+        if chunk_id in completed_ids:
+            continue
+        future = text_pool.submit(
+            _extract_range_text, str(pdf_path), stat.st_size, stat.st_mtime_ns, start, end, max_chars
+        )
+        queue.append(((idx, chunk_id, start, end), future))
+        if len(queue) >= window:
+            key, future = queue.popleft()
+            yield key, future.result()
+    while queue:
+        key, future = queue.popleft()
+        yield key, future.result()
+
+
+def _submit_in_order(
+    pool: ThreadPoolExecutor,
+    chunks: Iterator[tuple[_ChunkKey, str]],
+    window: int,
+    by_text_hash: dict[str, Future[list[dict[str, str]]]],
+) -> Iterator[tuple[_ChunkKey, Future[list[dict[str, str]]] | None]]:
+    """
+    Submit topic extraction lazily and yield futures in chunk order.
+
+    At most `window` submitted chunks are left unconsumed, so chunk text for
+    the rest of the file is not extracted and held in memory ahead of Gemini.
+    Empty chunks yield None instead of a future. Chunks whose text was already
+    submitted in this run (tracked in by_text_hash) share the earlier future.
+    """
+    queue: deque[tuple[_ChunkKey, Future[list[dict[str, str]]] | None]] = deque()
+    for key, chunk_text in chunks:
+        future = None
+        if chunk_text:
+            text_hash = hashlib.sha256(chunk_text.encode("utf-8")).hexdigest()
+            future = by_text_hash.get(text_hash)
+            if future is None:
+                future = pool.submit(_gemini_extract_topics, chunk_text)
+                by_text_hash[text_hash] = future
+        queue.append((key, future))
+        if len(queue) >= window:
+            yield queue.popleft()
+    while queue:
+        yield queue.popleft()
 
 
 def _fallback_extract_topics(chunk_text: str) -> list[dict[str, str]]:
     # Fallback for local runs without API key.
-    candidates = re.findall(r"\b[A-Z][A-Za-z0-9\-]{3,}(?:\s+[A-Z][A-Za-z0-9\-]{3,}){0,3}\b", chunk_text)
+    # finditer stops scanning once enough topics are found.
     seen: set[str] = set()
     topics: list[dict[str, str]] = []
-    for item in candidates:
-        topic = item.strip()
+    for match in _TITLE_RE.finditer(chunk_text):
+        topic = match.group(0).strip()
         if topic in seen:
             continue
         seen.add(topic)
@@ -345,8 +635,8 @@ def normalize_topic_label(topic: str) -> str:
     """
     Normalize topic string for de-duplication across chunk outputs.
     """
-    normalized = re.sub(r"[^a-zA-Z0-9\s]", " ", topic.lower())
-    normalized = re.sub(r"\s+", " ", normalized).strip()
+    normalized = _NON_ALNUM_RE.sub(" ", topic.lower())
+    normalized = " ".join(normalized.split())
     return normalized
 
 
@@ -365,11 +655,23 @@ def _target_course_ids(meta: dict[str, Any], state: dict[str, Any]) -> list[str]
     return ["shared"]
 
 
+def _topic_cache_path(chunk_text: str) -> Path:
+    key = hashlib.sha256(
+        f"{SETTINGS.model}|{_TOPIC_PROMPT_VERSION}|{chunk_text}".encode("utf-8")
+    ).hexdigest()
+    return SETTINGS.artifacts_dir / "gemini_cache" / key[:2] / f"{key}.json"
+
+
 def _gemini_extract_topics(chunk_text: str) -> list[dict[str, str]]:
     if not SETTINGS.google_api_key:
         return _fallback_extract_topics(chunk_text)
 
-    client = genai.Client(api_key=SETTINGS.google_api_key)
+    cache_path = _topic_cache_path(chunk_text)
+    cached = read_cached(cache_path)
+    if cached is not None:
+        return cached
+
+    client = get_client()
     prompt = (
         "You extract study topics from textbook/syllabus text. "
         "Return strict JSON array only. "
@@ -379,6 +681,7 @@ def _gemini_extract_topics(chunk_text: str) -> list[dict[str, str]]:
     )
 
     def _call() -> list[dict[str, str]]:
+        _RATE_LIMITER.acquire()
         resp = client.models.generate_content(
             model=SETTINGS.model,
             contents=prompt,
@@ -388,10 +691,10 @@ def _gemini_extract_topics(chunk_text: str) -> list[dict[str, str]]:
             ),
         )
         raw = (resp.text or "").strip()
-        raw = re.sub(r"^```json|^```|```$", "", raw, flags=re.MULTILINE).strip()
+        raw = _FENCE_RE.sub("", raw).strip()
         parsed = json.loads(raw)
         if not isinstance(parsed, list):
-            return _fallback_extract_topics(chunk_text)
+            return []
         normalized = []
         for item in parsed:
             if not isinstance(item, dict):
@@ -405,16 +708,21 @@ def _gemini_extract_topics(chunk_text: str) -> list[dict[str, str]]:
                         "evidence_summary": evidence[:240] or "Extracted topic evidence.",
                     }
                 )
-        return normalized or _fallback_extract_topics(chunk_text)
+        return normalized
 
     try:
-        return retry_with_backoff(
+        topics = retry_with_backoff(
             _call,
             max_retries=SETTINGS.max_gemini_retries,
             base_seconds=SETTINGS.retry_base_seconds,
         )
     except Exception as exc:  # noqa: BLE001
         raise RuntimeError(f"Gemini extraction failed after retries: {exc}") from exc
+    if not topics:
+        return _fallback_extract_topics(chunk_text)
+    # Only usable model output is cached, so a bad response is asked again next run.
+    write_cached(cache_path, topics)
+    return topics
 
 
 def _chunk_ranges(page_count: int, max_pages_per_chunk: int) -> list[tuple[int, int]]:
@@ -441,6 +749,8 @@ def run_ingestion(
     all_topic_evidence: list[dict[str, Any]] = []
     warnings: list[str] = []
     file_registry = state.get("file_registry", {})
+    # Identical chunk text (shared boilerplate, duplicate pages) is extracted once per run.
+    submitted_by_hash: dict[str, Future[list[dict[str, str]]]] = {}
 
     for file_id, meta in file_registry.items():
         per_file_state = state["ingestion_state"]["files"].setdefault(
@@ -471,70 +781,98 @@ def run_ingestion(
             per_file_state["last_error"] = warning
             continue
 
-        reader = PdfReader(str(pdf_path))
-        ranges = _chunk_ranges(len(reader.pages), max_pages)
-        per_file_state["chunking"] = {
-            "mode": "page_window",
-            "max_pages_per_chunk": max_pages,
-            "total_chunks": len(ranges),
-        }
-
-        chunk_results = per_file_state.get("chunk_results", [])
-        completed_ids = {item["chunk_id"] for item in chunk_results if "chunk_id" in item}
-        if force_reprocess:
-            chunk_results = []
-            completed_ids = set()
-            per_file_state["processed_chunks"] = 0
-            per_file_state["failed_chunks"] = []
-
-        topic_evidence_for_file: list[dict[str, Any]] = []
-        for idx, (start, end) in enumerate(ranges):
-            chunk_id = f"{file_id}:{idx}"
-            if chunk_id in completed_ids:
-                continue
+        # Materialize the page list once; indexing reader.pages walks the page tree.
+        # `document` stays open for the rest of the file so its pages remain valid.
+        document, pages = _open_pdf_pages(pdf_path)
+        try:
+            ranges = _chunk_ranges(len(pages), max_pages)
+            previous_chunking = per_file_state.get("chunking", {})
+            chunking = {
+                "mode": "page_window",
+                "max_pages_per_chunk": max_pages,
+                "max_chars_per_chunk": max_chars,
+                "text_backend": _TEXT_BACKEND,
+                "total_chunks": len(ranges),
+            }
+            per_file_state["chunking"] = chunking
+            # Chunk ids are positional, so results chunked with other limits or another text
+            # backend cannot be resumed without skipping or repeating pages; redo the file.
+            layout_changed = any(
+                previous_chunking.get(key, _LEGACY_CHUNKING.get(key)) != chunking[key]
+                for key in ("max_pages_per_chunk", "max_chars_per_chunk", "text_backend")
+            )
 
-            chunk_text = _extract_pages_text(reader, start, end, max_chars=max_chars)
-            if not chunk_text:
-                chunk_results.append(
-                    {
-                        "chunk_id": chunk_id,
-                        "page_start": start + 1,
-                        "page_end": end,
-                        "topics": [],
-                        "status": "empty",
-                    }
+            chunk_results = per_file_state.get("chunk_results", [])
+            completed_ids = {item["chunk_id"] for item in chunk_results if "chunk_id" in item}
+            if force_reprocess or layout_changed:
+                chunk_results = []
+                completed_ids = set()
+                per_file_state["processed_chunks"] = 0
+                per_file_state["failed_chunks"] = []
+
+            topic_evidence_for_file: list[dict[str, Any]] = []
+            # Depends only on the file's mapping, so resolve it once per file.
+            target_course_ids = _target_course_ids(meta, state)
+            # PDF readers are not thread-safe, so page text is extracted in order, either here
+            # or, for multi-chunk files with INGESTION_TEXT_WORKERS set, in worker processes.
+            # Only the Gemini calls run on the thread pool. Results are consumed in chunk order.
+            text_pool = _text_pool() if len(ranges) > 1 else None
+            if text_pool is not None:
+                chunk_texts = _iter_chunk_texts_in_pool(
+                    text_pool, pdf_path, file_id, ranges, completed_ids, max_chars
                 )
-                per_file_state["processed_chunks"] = per_file_state.get("processed_chunks", 0) + 1
-                continue
-
-            try:
-                topics = _gemini_extract_topics(chunk_text)
-                chunk_results.append(
-                    {
-                        "chunk_id": chunk_id,
-                        "page_start": start + 1,
-                        "page_end": end,
-                        "topics": topics,
-                        "status": "complete",
-                    }
+            else:
+                chunk_texts = _iter_chunk_texts(pages, file_id, ranges, completed_ids, max_chars)
+            with ThreadPoolExecutor(max_workers=SETTINGS.ingestion_concurrency) as pool:
+                submitted = _submit_in_order(
+                    pool,
+                    chunk_texts,
+                    window=2 * SETTINGS.ingestion_concurrency,
+                    by_text_hash=submitted_by_hash,
                 )
-                per_file_state["processed_chunks"] = per_file_state.get("processed_chunks", 0) + 1
-                for topic_item in topics:
-                    topic_evidence_for_file.append(
-                        {
-                            "course_ids": _target_course_ids(meta, state),
-                            "topic": topic_item["topic"],
-                            "evidence_summary": topic_item["evidence_summary"],
-                            "source_files": [file_id],
-                            "source_chunks": [chunk_id],
-                        }
-                    )
-                time.sleep(0.3)
-            except Exception as exc:  # noqa: BLE001
-                per_file_state.setdefault("failed_chunks", []).append(idx)
-                per_file_state["status"] = "partial"
-                per_file_state["last_error"] = str(exc)
-                warnings.append(f"{file_id} chunk {idx} failed: {exc}")
+                for (idx, chunk_id, start, end), future in submitted:
+                    if future is None:
+                        chunk_results.append(
+                            {
+                                "chunk_id": chunk_id,
+                                "page_start": start + 1,
+                                "page_end": end,
+                                "topics": [],
+                                "status": "empty",
+                            }
+                        )
+                        per_file_state["processed_chunks"] = per_file_state.get("processed_chunks", 0) + 1
+                        continue
+
+                    try:
+                        topics = future.result()
+                        chunk_results.append(
+                            {
+                                "chunk_id": chunk_id,
+                                "page_start": start + 1,
+                                "page_end": end,
+                                "topics": topics,
+                                "status": "complete",
+                            }
+                        )
+                        per_file_state["processed_chunks"] = per_file_state.get("processed_chunks", 0) + 1
+                        for topic_item in topics:
+                            topic_evidence_for_file.append(
+                                {
+                                    "course_ids": target_course_ids,
+                                    "topic": topic_item["topic"],
+                                    "evidence_summary": topic_item["evidence_summary"],
+                                    "source_files": [file_id],
+                                    "source_chunks": [chunk_id],
+                                }
+                            )
+                    except Exception as exc:  # noqa: BLE001
+                        per_file_state.setdefault("failed_chunks", []).append(idx)
+                        per_file_state["status"] = "partial"
+                        per_file_state["last_error"] = str(exc)
+                        warnings.append(f"{file_id} chunk {idx} failed: {exc}")
+        finally:
+            _close_pdf(document, pages)
 
         per_file_state["chunk_results"] = chunk_results
         total = per_file_state["chunking"]["total_chunks"]
@@ -547,13 +885,14 @@ def run_ingestion(
         per_file_state["topic_evidence"] = topic_evidence_for_file
         all_topic_evidence.extend(topic_evidence_for_file)
 
+    # Sources accumulate in sets while merging and are sorted once at the end.
     merged: dict[tuple[str, str], dict[str, Any]] = {}
     for item in all_topic_evidence:
+        normalized_topic = normalize_topic_label(item["topic"])
+        if not normalized_topic:
+            continue
         course_ids = item.get("course_ids") or ["shared"]
         for course_id in course_ids:
-            normalized_topic = normalize_topic_label(item["topic"])
-            if not normalized_topic:
-                continue
             key = (course_id, normalized_topic)
             if key not in merged:
                 merged[key] = {
@@ -561,22 +900,20 @@ def run_ingestion(
                     "topic": item["topic"],
                     "normalized_topic": normalized_topic,
                     "evidence_summary": item["evidence_summary"],
-                    "source_files": [],
-                    "source_chunks": [],
+                    "source_files": set(),
+                    "source_chunks": set(),
                 }
             merged_item = merged[key]
-            merged_item["source_files"] = sorted(
-                set(merged_item["source_files"] + item["source_files"])
-            )
-            merged_item["source_chunks"] = sorted(
-                set(merged_item["source_chunks"] + item["source_chunks"])
-            )
+            merged_item["source_files"].update(item["source_files"])
+            merged_item["source_chunks"].update(item["source_chunks"])
             if len(item.get("topic", "")) > len(merged_item.get("topic", "")):
                 merged_item["topic"] = item["topic"]
+    for merged_item in merged.values():
+        merged_item["source_files"] = sorted(merged_item["source_files"])
+        merged_item["source_chunks"] = sorted(merged_item["source_chunks"])
 
     state["ingestion_state"]["course_topic_evidence"] = list(merged.values())
     _append_event(
-        state,
         session_id=session_id,
         agent_name="IngestionAgent",
         event_type="complete",
@@ -588,7 +925,6 @@ def run_ingestion(
     )
     if warnings:
         _append_event(
-            state,
             session_id=session_id,
             agent_name="IngestionAgent",
             event_type="error",
@@ -619,5 +955,5 @@ def get_session_ingestion_state(session_id: str) -> dict[str, Any]:
         "status": state["status"],
         "file_registry": state.get("file_registry", {}),
         "ingestion_state": state.get("ingestion_state", {}),
-        "events": state.get("events", []),
+        "events": read_events(session_dir(session_id), state),
     }
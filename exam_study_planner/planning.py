@@ -1,17 +1,23 @@
 from __future__ import annotations
 
-import json
+import heapq
+import sys
 from dataclasses import dataclass
-from datetime import UTC, date, datetime, timedelta
-from pathlib import Path
+from datetime import UTC, date, datetime
 from typing import Any
 
-from .settings import get_settings
+from .storage import (
+    append_event,
+    ensure_session_dir,
+    read_events,
+    read_state,
+    session_dir,
+    state_path,
+    write_state,
+)
 
-SETTINGS = get_settings()
 
-
-@dataclass
+@dataclass(slots=True)
 class TopicTask:
     course_id: str
     course_name: str
@@ -20,46 +26,39 @@ class TopicTask:
     remaining_minutes: int
     priority: str
     source_files: list[str]
+    priority_rank: int
 
 
-def _now_iso() -> str:
-    return datetime.now(tz=UTC).isoformat()
-
-
-def _session_dir(session_id: str) -> Path:
-    return SETTINGS.artifacts_dir / "sessions" / session_id
+_PRIORITY_RANK = {"high": 0, "medium": 1, "low": 2}
 
 
-def _state_path(session_id: str) -> Path:
-    return _session_dir(session_id) / "state.json"
+def _now_iso() -> str:
+    return datetime.now(tz=UTC).isoformat()
 
 
 def _load_state(session_id: str) -> dict[str, Any]:
-    path = _state_path(session_id)
-    if not path.exists():
-        raise ValueError(f"Session state not found: {path}")
-    return json.loads(path.read_text(encoding="utf-8"))
+    path = state_path(session_id)
+    try:
+        return read_state(path)
+    except FileNotFoundError as exc:
+        raise ValueError(f"Session state not found: {path}") from exc
 
 
 def _save_state(session_id: str, state: dict[str, Any]) -> None:
-    session_dir = _session_dir(session_id)
-    session_dir.mkdir(parents=True, exist_ok=True)
+    ensure_session_dir(session_id)
     state["updated_at"] = _now_iso()
-    _state_path(session_id).write_text(
-        json.dumps(state, indent=2, ensure_ascii=True),
-        encoding="utf-8",
-    )
+    write_state(state_path(session_id), state)
 
 
 def _append_event(
-    state: dict[str, Any],
     session_id: str,
     agent_name: str,
     event_type: str,
     summary: str,
     artifact_refs: list[str] | None = None,
 ) -> None:
-    state.setdefault("events", []).append(
+    append_event(
+        session_dir(session_id),
         {
             "timestamp": _now_iso(),
             "session_id": session_id,
@@ -67,57 +66,49 @@ def _append_event(
             "event_type": event_type,
             "summary": summary,
             "artifact_refs": artifact_refs or [],
-        }
+        },
     )
 
 
-def _priority_rank(priority: str) -> int:
-    p = priority.lower().strip()
-    if p == "high":
-        return 0
-    if p == "medium":
-        return 1
-    return 2
-
-
-def _date_range(start: date, end: date) -> list[date]:
-    days: list[date] = []
-    cur = start
-    while cur <= end:
-        days.append(cur)
-        cur = cur + timedelta(days=1)
-    return days
-
-
 def _build_tasks(state: dict[str, Any]) -> tuple[list[TopicTask], date]:
-    courses = state.get("user_inputs", {}).get("courses", [])
-    course_map: dict[str, dict[str, Any]] = {c["course_id"]: c for c in courses if c.get("course_id")}
-    if not course_map:
+    courses = (state.get("user_inputs") or {}).get("courses", ())
+    if not any(c.get("course_id") for c in courses):
         raise ValueError("No courses found in user_inputs. Register courses first.")
 
-    estimates = state.get("estimation_state", {}).get("topic_estimates", [])
+    estimates = (state.get("estimation_state") or {}).get("topic_estimates", ())
     if not estimates:
         raise ValueError("No topic_estimates found. Run estimation first.")
 
+    midterms = [date.fromisoformat(c["midterm_date"]) for c in courses]
+    last_midterm = max(midterms)
+    # course_id -> (course name, parsed midterm), resolved once instead of per estimate.
+    course_info = {
+        c["course_id"]: (str(c.get("course_name", c["course_id"])), midterm)
+        for c, midterm in zip(courses, midterms)
+        if c.get("course_id")
+    }
+
     tasks: list[TopicTask] = []
-    last_midterm = max(date.fromisoformat(c["midterm_date"]) for c in courses)
     for est in estimates:
         course_id = str(est.get("course_id", "")).strip()
-        if course_id not in course_map:
+        if course_id not in course_info:
             continue
-        course = course_map[course_id]
+        course_name, course_midterm = course_info[course_id]
         minutes = int(est.get("estimated_minutes", 0))
         if minutes <= 0:
             continue
+        # A handful of distinct labels repeat across every task; share one string each.
+        priority = sys.intern(str(est.get("priority", "medium")))
         tasks.append(
             TopicTask(
                 course_id=course_id,
-                course_name=str(course.get("course_name", course_id)),
-                course_midterm=date.fromisoformat(course["midterm_date"]),
+                course_name=course_name,
+                course_midterm=course_midterm,
                 topic=str(est.get("topic", "General Review")).strip() or "General Review",
                 remaining_minutes=minutes,
-                priority=str(est.get("priority", "medium")),
+                priority=priority,
                 source_files=[str(x) for x in est.get("source_files", [])],
+                priority_rank=_PRIORITY_RANK.get(priority.lower().strip(), 2),
             )
         )
 
@@ -126,17 +117,59 @@ def _build_tasks(state: dict[str, Any]) -> tuple[list[TopicTask], date]:
     return tasks, last_midterm
 
 
-def _pick_next_task(tasks: list[TopicTask], current_date: date) -> TopicTask | None:
-    eligible = [t for t in tasks if t.remaining_minutes > 0 and current_date <= t.course_midterm]
-    if not eligible:
-        return None
-
-    def sort_key(t: TopicTask) -> tuple[int, int, int]:
-        days_left = max(0, (t.course_midterm - current_date).days)
-        return (days_left, _priority_rank(t.priority), -t.remaining_minutes)
-
-    eligible.sort(key=sort_key)
-    return eligible[0]
+def _allocate_blocks(
+    remaining: list[int],
+    midterm_ordinals: list[int],
+    priority_ranks: list[int],
+    first_day: int,
+    last_day: int,
+    daily_cap: int,
+    min_block: int,
+    max_block: int,
+) -> list[tuple[int, int, int]]:
+    """
+    Greedy day-by-day allocation over plain int arrays, one entry per task.
+
+    Each block goes to the eligible task with the nearest midterm, then highest
+    priority, then most remaining minutes, ties broken by task index. Only the
+    task being scheduled changes, so a single heap serves the whole timeline;
+    tasks whose midterm has passed are dropped lazily.
+
+    Returns (day ordinal, task index, minutes) per block, with task index -1
+    for a day that received no block. `remaining` is decremented in place.
+    """
+    heap = [
+        (midterm_ordinals[idx], priority_ranks[idx], -minutes, idx)
+        for idx, minutes in enumerate(remaining)
+        if minutes > 0
+    ]
+    heapq.heapify(heap)
+    allocations: list[tuple[int, int, int]] = []
+    for day in range(first_day, last_day + 1):
+        remaining_day = daily_cap
+        wrote_any = False
+        while remaining_day >= min_block:
+            while heap and heap[0][0] < day:
+                heapq.heappop(heap)
+            if not heap:
+                break
+            midterm_ordinal, rank, _, idx = heap[0]
+            left = remaining[idx]
+            block = min(max_block, left, remaining_day)
+            if block < min_block and left >= min_block:
+                break
+            left -= block
+            remaining[idx] = left
+            remaining_day -= block
+            wrote_any = True
+            allocations.append((day, idx, block))
+            if left > 0:
+                heapq.heapreplace(heap, (midterm_ordinal, rank, -left, idx))
+            else:
+                heapq.heappop(heap)
+        if not wrote_any:
+            allocations.append((day, -1, 0))
+    return allocations
 
 
 def build_schedule_plan(
@@ -147,7 +180,8 @@ def build_schedule_plan(
     force_reprocess: bool = False,
 ) -> dict[str, Any]:
     state = _load_state(session_id)
-    existing = state.get("planning_state", {}).get("plan_rows", [])
+    planning_state = state.get("planning_state") or {}
+    existing = planning_state.get("plan_rows", ())
     if existing and not force_reprocess:
         return {
             "session_id": session_id,
@@ -155,7 +189,7 @@ def build_schedule_plan(
             "reused_existing": True,
             "plan_rows_count": len(existing),
             "date_start": existing[0]["date"] if existing else "",
-            "date_end": state.get("planning_state", {}).get("last_midterm_date", ""),
+            "date_end": planning_state.get("last_midterm_date", ""),
         }
 
     tasks, last_midterm = _build_tasks(state)
@@ -165,38 +199,40 @@ def build_schedule_plan(
             f"Cannot plan: all midterms are in the past (today={start_date.isoformat()}, last_midterm={last_midterm.isoformat()})."
         )
 
-    plan_rows: list[dict[str, Any]] = []
-    timeline = _date_range(start_date, last_midterm)
-    for day in timeline:
-        remaining_day = max(0, int(daily_study_cap_minutes))
-        wrote_any = False
-        while remaining_day >= min_block_minutes:
-            task = _pick_next_task(tasks, current_date=day)
-            if not task:
-                break
-            block = min(max_block_minutes, task.remaining_minutes, remaining_day)
-            if block < min_block_minutes and task.remaining_minutes >= min_block_minutes:
-                break
-            task.remaining_minutes -= block
-            remaining_day -= block
-            wrote_any = True
-            plan_rows.append(
-                {
-                    "date": day.isoformat(),
-                    "course": task.course_name,
-                    "topic": task.topic,
-                    "task_description": f"Study and practice {task.topic}.",
-                    "estimated_minutes": int(block),
-                    "priority": task.priority.lower().strip() or "medium",
-                    "source_files": task.source_files,
-                    "status": "planned",
-                }
-            )
+    remaining = [t.remaining_minutes for t in tasks]
+    allocations = _allocate_blocks(
+        remaining,
+        [t.course_midterm.toordinal() for t in tasks],
+        [t.priority_rank for t in tasks],
+        start_date.toordinal(),
+        last_midterm.toordinal(),
+        max(0, int(daily_study_cap_minutes)),
+        min_block_minutes,
+        max_block_minutes,
+    )
 
-        if not wrote_any:
+    # Row fields that depend only on the task are built once, not per block.
+    task_fields = [
+        (
+            t.course_name,
+            t.topic,
+            f"Study and practice {t.topic}.",
+            t.priority.lower().strip() or "medium",
+            t.source_files,
+        )
+        for t in tasks
+    ]
+    plan_rows: list[dict[str, Any]] = []
+    day_ordinal = -1
+    day_iso = ""
+    for ordinal, idx, block in allocations:
+        if ordinal != day_ordinal:
+            day_ordinal = ordinal
+            day_iso = date.fromordinal(ordinal).isoformat()
+        if idx < 0:
             plan_rows.append(
                 {
-                    "date": day.isoformat(),
+                    "date": day_iso,
                     "course": "General",
                     "topic": "Buffer/Review",
                     "task_description": "Buffer day for review, catch-up, or rest.",
@@ -206,15 +242,29 @@ def build_schedule_plan(
                     "status": "planned",
                 }
             )
+            continue
+        course_name, topic, description, priority, source_files = task_fields[idx]
+        plan_rows.append(
+            {
+                "date": day_iso,
+                "course": course_name,
+                "topic": topic,
+                "task_description": description,
+                "estimated_minutes": int(block),
+                "priority": priority,
+                "source_files": source_files,
+                "status": "planned",
+            }
+        )
 
-    unscheduled = [t for t in tasks if t.remaining_minutes > 0]
+    unscheduled = [minutes for minutes in remaining if minutes > 0]
     warnings: list[str] = []
     if unscheduled:
         warnings.append(
             f"{len(unscheduled)} topics could not be fully scheduled before their midterm dates."
         )
 
-    previous_version = int(state.get("planning_state", {}).get("plan_version", 0))
+    previous_version = int(planning_state.get("plan_version", 0))
     state["status"] = "reviewing"
     state["planning_state"] = {
         "plan_version": previous_version + 1,
@@ -223,7 +273,6 @@ def build_schedule_plan(
         "warnings": warnings,
     }
     _append_event(
-        state,
         session_id=session_id,
         agent_name="PlanningReviewerAgent",
         event_type="complete",
@@ -245,11 +294,14 @@ def build_schedule_plan(
     }
 
 
-def get_session_planning_state(session_id: str) -> dict[str, Any]:
-    state = _load_state(session_id)
+def planning_state_payload(state: dict[str, Any], session_id: str) -> dict[str, Any]:
     return {
         "session_id": state.get("session_id", session_id),
         "status": state.get("status", ""),
         "planning_state": state.get("planning_state", {}),
-        "events": state.get("events", []),
+        "events": read_events(session_dir(session_id), state),
     }
+
+
+def get_session_planning_state(session_id: str) -> dict[str, Any]:
+    return planning_state_payload(_load_state(session_id), session_id)
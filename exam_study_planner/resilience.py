@@ -1,26 +1,70 @@
 from __future__ import annotations
 
 import random
+import re
+import threading
 import time
 from typing import Callable, TypeVar
 
 T = TypeVar("T")
 
 
+_RETRY_MARKERS = (
+    "429",
+    "rate limit",
+    "temporarily unavailable",
+    "timeout",
+    "timed out",
+    "connection reset",
+    "service unavailable",
+    "internal error",
+    "resource exhausted",
+)
+# One scan of the message for all markers instead of a substring search per marker.
+_RETRY_RE = re.compile("|".join(map(re.escape, _RETRY_MARKERS)))
+
+
 def is_retryable_error(exc: Exception) -> bool:
-    text = str(exc).lower()
-    retry_markers = [
-        "429",
-        "rate limit",
-        "temporarily unavailable",
-        "timeout",
-        "timed out",
-        "connection reset",
-        "service unavailable",
-        "internal error",
-        "resource exhausted",
-    ]
-    return any(marker in text for marker in retry_markers)
+    return _RETRY_RE.search(str(exc).lower()) is not None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting calls to `rate` per second.
+
+    acquire() only sleeps once the burst `capacity` is spent; a non-positive
+    rate disables limiting.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve a token now; a negative balance is the wait owed by this caller.
+            self._tokens -= 1.0
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _next_sleep(previous: float, base_seconds: float, max_sleep_seconds: float) -> float:
+    """
+    Decorrelated jitter: a random delay between base and three times the previous one.
+
+    Concurrent callers spread out instead of retrying in lockstep, and the
+    expected total wait is lower than doubling plus a small fixed jitter.
+    """
+    return min(max_sleep_seconds, random.uniform(base_seconds, previous * 3))
 
 
 def retry_with_backoff(
@@ -31,6 +75,7 @@ def retry_with_backoff(
     max_sleep_seconds: float = 20.0,
 ) -> T:
     attempt = 0
+    sleep_s = base_seconds
     while True:
         try:
             return func()
@@ -38,6 +83,5 @@ def retry_with_backoff(
             attempt += 1
             if attempt >= max_retries or not is_retryable_error(exc):
                 raise
-            sleep_s = min(max_sleep_seconds, base_seconds * (2 ** (attempt - 1)))
-            # Small jitter to reduce thundering herd behavior on retries.
-            time.sleep(sleep_s + random.uniform(0.0, 0.2))
+            sleep_s = _next_sleep(sleep_s, base_seconds, max_sleep_seconds)
+            time.sleep(sleep_s)
@@ -1,54 +1,48 @@
 from __future__ import annotations
 
-import json
-from datetime import UTC, date, datetime, timedelta
-from pathlib import Path
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import UTC, date, datetime
 from typing import Any
 
 from .planning import build_schedule_plan
-from .settings import get_settings
-
-SETTINGS = get_settings()
+from .storage import (
+    append_event,
+    ensure_session_dir,
+    read_state,
+    session_dir,
+    state_path,
+    write_state,
+)
 
 
 def _now_iso() -> str:
     return datetime.now(tz=UTC).isoformat()
 
 
-def _session_dir(session_id: str) -> Path:
-    return SETTINGS.artifacts_dir / "sessions" / session_id
-
-
-def _state_path(session_id: str) -> Path:
-    return _session_dir(session_id) / "state.json"
-
-
 def _load_state(session_id: str) -> dict[str, Any]:
-    path = _state_path(session_id)
-    if not path.exists():
-        raise ValueError(f"Session state not found: {path}")
-    return json.loads(path.read_text(encoding="utf-8"))
+    path = state_path(session_id)
+    try:
+        return read_state(path)
+    except FileNotFoundError as exc:
+        raise ValueError(f"Session state not found: {path}") from exc
 
 
 def _save_state(session_id: str, state: dict[str, Any]) -> None:
-    session_dir = _session_dir(session_id)
-    session_dir.mkdir(parents=True, exist_ok=True)
+    ensure_session_dir(session_id)
     state["updated_at"] = _now_iso()
-    _state_path(session_id).write_text(
-        json.dumps(state, indent=2, ensure_ascii=True),
-        encoding="utf-8",
-    )
+    write_state(state_path(session_id), state)
 
 
 def _append_event(
-    state: dict[str, Any],
     session_id: str,
     agent_name: str,
     event_type: str,
     summary: str,
     artifact_refs: list[str] | None = None,
 ) -> None:
-    state.setdefault("events", []).append(
+    append_event(
+        session_dir(session_id),
         {
             "timestamp": _now_iso(),
             "session_id": session_id,
@@ -56,17 +50,12 @@ def _append_event(
             "event_type": event_type,
             "summary": summary,
             "artifact_refs": artifact_refs or [],
-        }
+        },
     )
 
 
 def _date_range(start: date, end: date) -> list[str]:
-    out: list[str] = []
-    cur = start
-    while cur <= end:
-        out.append(cur.isoformat())
-        cur = cur + timedelta(days=1)
-    return out
+    return [date.fromordinal(o).isoformat() for o in range(start.toordinal(), end.toordinal() + 1)]
 
 
 def _is_capacity_limited_only(validation_report: dict[str, Any]) -> bool:
@@ -79,13 +68,19 @@ def _is_capacity_limited_only(validation_report: dict[str, Any]) -> bool:
     )
 
 
-def _validate_plan(state: dict[str, Any], daily_cap: int) -> tuple[dict[str, Any], list[str]]:
-    planning_state = state.get("planning_state", {})
-    plan_rows = planning_state.get("plan_rows", [])
-    courses = state.get("user_inputs", {}).get("courses", [])
-    estimates = state.get("estimation_state", {}).get("topic_estimates", [])
-    if not plan_rows:
-        raise ValueError("No plan_rows found. Run planning first.")
+@dataclass(frozen=True)
+class _PlanRequirements:
+    """Inputs to validation that depend only on courses and estimates, not on plan rows."""
+
+    course_midterms: dict[str, date]
+    required_dates: frozenset[str]
+    needed_topics: frozenset[tuple[str, str]]
+    total_estimated_minutes: int
+
+
+def _plan_requirements(state: dict[str, Any]) -> _PlanRequirements:
+    courses = (state.get("user_inputs") or {}).get("courses", ())
+    estimates = (state.get("estimation_state") or {}).get("topic_estimates", ())
 
     course_midterms = {
         c["course_name"]: date.fromisoformat(c["midterm_date"])
@@ -93,24 +88,13 @@ def _validate_plan(state: dict[str, Any], daily_cap: int) -> tuple[dict[str, Any
         if c.get("course_name") and c.get("midterm_date")
     }
     last_midterm = max(date.fromisoformat(c["midterm_date"]) for c in courses)
-    today = date.today()
-
-    all_plan_dates = {r["date"] for r in plan_rows if r.get("date")}
-    required_dates = set(_date_range(today, last_midterm))
-    date_range_ok = required_dates.issubset(all_plan_dates)
 
-    covered_topics = {
-        (str(r.get("course", "")).strip(), str(r.get("topic", "")).strip().lower())
-        for r in plan_rows
-        if str(r.get("course", "")).strip() not in {"", "General"}
-    }
     course_map = {c["course_id"]: c["course_name"] for c in courses if c.get("course_id") and c.get("course_name")}
-    needed_topics = {
+    needed_topics = frozenset(
         (course_map.get(str(e.get("course_id", "")), ""), str(e.get("topic", "")).strip().lower())
         for e in estimates
         if str(e.get("course_id", "")).strip() in course_map and str(e.get("topic", "")).strip()
-    }
-    coverage_ok = needed_topics.issubset(covered_topics)
+    )
 
     total_estimated_minutes = 0
     for est in estimates:
@@ -119,20 +103,53 @@ def _validate_plan(state: dict[str, Any], daily_cap: int) -> tuple[dict[str, Any
             continue
         total_estimated_minutes += max(0, int(est.get("estimated_minutes", 0)))
 
-    by_day: dict[str, int] = {}
+    return _PlanRequirements(
+        course_midterms=course_midterms,
+        required_dates=frozenset(_date_range(date.today(), last_midterm)),
+        needed_topics=needed_topics,
+        total_estimated_minutes=total_estimated_minutes,
+    )
+
+
+def _validate_plan(
+    state: dict[str, Any],
+    daily_cap: int,
+    requirements: _PlanRequirements | None = None,
+) -> tuple[dict[str, Any], list[str]]:
+    plan_rows = (state.get("planning_state") or {}).get("plan_rows", ())
+    if not plan_rows:
+        raise ValueError("No plan_rows found. Run planning first.")
+    # Revision rounds only rebuild plan rows, so callers pass requirements computed once.
+    requirements = requirements or _plan_requirements(state)
+    course_midterms = requirements.course_midterms
+    required_dates = requirements.required_dates
+    total_estimated_minutes = requirements.total_estimated_minutes
+
+    # One pass over the rows gathers dates, covered topics, per-day load, and deadline checks.
+    all_plan_dates: set[str] = set()
+    covered_topics: set[tuple[str, str]] = set()
+    by_day: defaultdict[str, int] = defaultdict(int)
     deadline_ok = True
     total_planned_minutes = 0
+    fromisoformat = date.fromisoformat
     for row in plan_rows:
+        raw_date = row.get("date")
+        if raw_date:
+            all_plan_dates.add(raw_date)
+        course_name = str(row.get("course", "")).strip()
+        if course_name not in ("", "General"):
+            covered_topics.add((course_name, str(row.get("topic", "")).strip().lower()))
         d = str(row.get("date", "")).strip()
         if not d:
             continue
         row_minutes = max(0, int(row.get("estimated_minutes", 0)))
-        by_day[d] = by_day.get(d, 0) + row_minutes
+        by_day[d] += row_minutes
         total_planned_minutes += row_minutes
-        course_name = str(row.get("course", "")).strip()
-        if course_name in course_midterms and date.fromisoformat(d) > course_midterms[course_name]:
+        if course_name in course_midterms and fromisoformat(d) > course_midterms[course_name]:
             deadline_ok = False
-    load_balance_ok = all(total <= daily_cap for total in by_day.values())
+    date_range_ok = required_dates.issubset(all_plan_dates)
+    coverage_ok = requirements.needed_topics.issubset(covered_topics)
+    load_balance_ok = max(by_day.values(), default=daily_cap) <= daily_cap
     total_available_minutes = len(required_dates) * max(0, int(daily_cap))
     capacity_shortfall_minutes = max(0, total_estimated_minutes - total_available_minutes)
     capacity_shortfall_detected = capacity_shortfall_minutes > 0
@@ -179,7 +196,10 @@ def review_and_finalize_plan(
         build_schedule_plan(session_id=session_id, daily_study_cap_minutes=daily_study_cap_minutes)
         state = _load_state(session_id)
 
-    validation_report, reasons = _validate_plan(state, daily_cap=daily_study_cap_minutes)
+    requirements = _plan_requirements(state)
+    validation_report, reasons = _validate_plan(
+        state, daily_cap=daily_study_cap_minutes, requirements=requirements
+    )
     rounds = 0
     cap = daily_study_cap_minutes
 
@@ -190,15 +210,15 @@ def review_and_finalize_plan(
         and not _is_capacity_limited_only(validation_report)
     ):
         rounds += 1
+        # No save here: state is unchanged since it was loaded, and the event goes
+        # straight to events.jsonl.
         _append_event(
-            state,
             session_id=session_id,
             agent_name="PlanningReviewerAgent",
             event_type="revision",
             summary=f"Starting revision round {rounds} with {len(reasons)} issues.",
             artifact_refs=[f"revision_round:{rounds}"],
         )
-        _save_state(session_id, state)
         if not validation_report.get("load_balance_ok", True):
             cap = min(480, cap + 60)
         build_schedule_plan(
@@ -207,7 +227,7 @@ def review_and_finalize_plan(
             force_reprocess=True,
         )
         state = _load_state(session_id)
-        validation_report, reasons = _validate_plan(state, daily_cap=cap)
+        validation_report, reasons = _validate_plan(state, daily_cap=cap, requirements=requirements)
 
     if not reasons:
         result_type = "approved_plan"
@@ -224,7 +244,6 @@ def review_and_finalize_plan(
         "effective_daily_study_cap_minutes": cap,
     }
     _append_event(
-        state,
         session_id=session_id,
         agent_name="PlanningReviewerAgent",
         event_type="review",
@@ -2,20 +2,27 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 
 from dotenv import load_dotenv
 
+_LOADED = False
+
 
 def _load_env() -> None:
-    """Load .env from repo root first, then package-local fallback."""
+    """Load .env from repo root first, then package-local fallback, once per process."""
+    global _LOADED
+    if _LOADED:
+        return
     package_dir = Path(__file__).resolve().parent
     repo_root = package_dir.parent
     load_dotenv(repo_root / ".env", override=False)
     load_dotenv(package_dir / ".env", override=False)
+    _LOADED = True
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Settings:
     model: str
     google_api_key: str
@@ -25,8 +32,15 @@ class Settings:
     max_chunk_chars: int
     max_gemini_retries: int
     retry_base_seconds: float
+    max_gemini_concurrency: int
+    ingestion_concurrency: int
+    ingestion_text_workers: int
+    gemini_rpm: float
+    pretty_state: bool
+    fsync_state: bool
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
     _load_env()
     package_dir = Path(__file__).resolve().parent
@@ -42,4 +56,10 @@ def get_settings() -> Settings:
         max_chunk_chars=int(os.getenv("INGESTION_MAX_CHUNK_CHARS", "18000")),
         max_gemini_retries=int(os.getenv("INGESTION_MAX_GEMINI_RETRIES", "5")),
         retry_base_seconds=float(os.getenv("INGESTION_RETRY_BASE_SECONDS", "1.2")),
+        max_gemini_concurrency=max(1, int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))),
+        ingestion_concurrency=max(1, int(os.getenv("INGESTION_CONCURRENCY", "4"))),
+        ingestion_text_workers=max(0, int(os.getenv("INGESTION_TEXT_WORKERS", "0"))),
+        gemini_rpm=float(os.getenv("GEMINI_RPM", "0")),
+        pretty_state=os.getenv("EXAM_STUDY_PLANNER_PRETTY_STATE", "0") == "1",
+        fsync_state=os.getenv("EXAM_STUDY_PLANNER_FSYNC_STATE", "0") == "1",
     )
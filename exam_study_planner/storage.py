@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Any, Iterator
+
+from .settings import get_settings
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speedup; stdlib json is the fallback.
+    orjson = None
+
+SETTINGS = get_settings()
+
+STATE_FILENAME = "state.json"
+PRETTY_STATE_FILENAME = "state.pretty.json"
+EVENTS_FILENAME = "events.jsonl"
+# Serializes appends with the legacy-event migration, which rewrites events.jsonl;
+# an append landing between its read and its rename would otherwise be lost.
+_EVENTS_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=256)
+def session_dir(session_id: str) -> Path:
+    return SETTINGS.artifacts_dir / "sessions" / session_id
+
+
+@lru_cache(maxsize=256)
+def state_path(session_id: str) -> Path:
+    return session_dir(session_id) / STATE_FILENAME
+
+
+_created_dirs: set[Path] = set()
+
+
+def ensure_session_dir(session_id: str) -> Path:
+    """Create the session directory once per process instead of on every save."""
+    directory = session_dir(session_id)
+    if directory not in _created_dirs:
+        directory.mkdir(parents=True, exist_ok=True)
+        _created_dirs.add(directory)
+    return directory
+
+
+def _encode(value: Any, pretty: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2 if pretty else None)
+    if pretty:
+        return json.dumps(value, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _decode(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_state(path: Path) -> dict[str, Any]:
+    return _decode(path.read_bytes())
+
+
+def _atomic_write(path: Path, data: bytes, fsync: bool = False) -> None:
+    """Write to a sibling temp file and rename it over path, so readers never see a partial file."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+    if fsync and os.name == "posix":
+        # Persist the rename itself; directories cannot be opened this way on Windows.
+        dir_fd = os.open(path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _migrate_legacy_events(session_dir: Path, legacy: list[dict[str, Any]]) -> None:
+    """Move events kept inside older state.json files to the front of events.jsonl."""
+    log_path = session_dir / EVENTS_FILENAME
+    migrated = b"".join(_encode(event) + b"\n" for event in legacy)
+    with _EVENTS_LOCK:
+        try:
+            existing = log_path.read_bytes()
+        except FileNotFoundError:
+            existing = b""
+        if existing.startswith(migrated):
+            # Already moved by an earlier save of the same (unmodified) caller state.
+            return
+        _atomic_write(log_path, migrated + existing)
+
+
+def write_state(path: Path, state: dict[str, Any]) -> None:
+    # Sessions created before events.jsonl carry their history in state["events"];
+    # move it out on the first save so state.json stops growing with it. The caller's
+    # dict is left untouched, and the stripped state lands before the log is rewritten
+    # so readers never see the legacy events in both places.
+    legacy_events = state.get("events")
+    if "events" in state:
+        state = {key: value for key, value in state.items() if key != "events"}
+    _atomic_write(path, _encode(state), fsync=SETTINGS.fsync_state)
+    if legacy_events:
+        _migrate_legacy_events(path.parent, legacy_events)
+    if SETTINGS.pretty_state:
+        # Debug aid: an indented copy for people; state.json itself stays compact.
+        _atomic_write(path.with_name(PRETTY_STATE_FILENAME), _encode(state, pretty=True))
+
+
+def append_event(session_dir: Path, event: dict[str, Any]) -> None:
+    """Append one event to the session's events.jsonl without rewriting state.json."""
+    data = _encode(event) + b"\n"
+    with _EVENTS_LOCK, (session_dir / EVENTS_FILENAME).open("ab") as f:
+        f.write(data)
+
+
+def append_events(session_dir: Path, events: list[dict[str, Any]]) -> None:
+    """Append several events with a single open and write."""
+    if not events:
+        return
+    data = b"".join(_encode(event) + b"\n" for event in events)
+    with _EVENTS_LOCK, (session_dir / EVENTS_FILENAME).open("ab") as f:
+        f.write(data)
+
+
+def _event_lines(session_dir: Path) -> list[bytes]:
+    try:
+        raw = (session_dir / EVENTS_FILENAME).read_bytes()
+    except FileNotFoundError:
+        return []
+    return [line for line in raw.splitlines() if line.strip()]
+
+
+def events_newest_first(
+    session_dir: Path,
+    state: dict[str, Any],
+) -> tuple[int, Iterator[dict[str, Any]]]:
+    """
+    Return the total event count and a lazy newest-first iterator over events.
+
+    Lines are only decoded as the iterator advances, so tail queries do not
+    parse the whole log.
+    """
+    legacy = state.get("events", [])
+    lines = _event_lines(session_dir)
+    newest_first = chain((_decode(line) for line in reversed(lines)), reversed(legacy))
+    return len(lines) + len(legacy), newest_first
+
+
+def read_events(session_dir: Path, state: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Return the full event stream for a session.
+
+    Sessions created before events.jsonl existed keep their events inside
+    state.json; those come first.
+    """
+    events = list(state.get("events", []))
+    events.extend(_decode(line) for line in _event_lines(session_dir))
+    return events
+
+
+def read_cached(path: Path) -> Any | None:
+    """Return a cached JSON value, or None when it is missing or unreadable."""
+    try:
+        return _decode(path.read_bytes())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_cached(path: Path, value: Any) -> None:
+    """Atomically store a JSON value; concurrent writers of the same key are safe."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _atomic_write(path, _encode(value))
@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+import functools
 import re
-from typing import Any
+from collections import defaultdict
+from typing import Any, Callable
 
-from .collaboration import read_collaboration_trace, record_collaboration_event
+from .collaboration import (
+    read_collaboration_trace,
+    record_collaboration_event,
+    record_collaboration_events,
+)
 from .estimation import estimate_workload, get_session_estimation_state
-from .export import export_study_plan_outputs, read_output_artifacts
+from .export import (
+    export_study_plan_outputs,
+    get_session_planning_bundle,
+    read_output_artifacts,
+)
 from .ingestion import (
     get_session_ingestion_state,
     link_files_to_courses,
@@ -17,6 +27,48 @@ from .planning import build_schedule_plan, get_session_planning_state
 from .review import review_and_finalize_plan
 from .resilience import is_retryable_error
 
+_SLUG_RE = re.compile(r"[^a-zA-Z0-9]+")
+_TOKEN_RE = re.compile(r"[a-zA-Z0-9]+")
+
+_StageTool = Callable[..., dict[str, Any]]
+
+
+def _stage(agent_name: str, stage: str) -> Callable[[_StageTool], _StageTool]:
+    """
+    Turn a pipeline stage tool's exceptions into a recorded error event and a failure dict.
+
+    functools.wraps keeps the wrapped signature and docstring, which ADK reads
+    to build the tool declaration.
+    """
+
+    def decorator(fn: _StageTool) -> _StageTool:
+        @functools.wraps(fn)
+        def wrapper(session_id: str, *args: Any, **kwargs: Any) -> dict[str, Any]:
+            try:
+                return fn(session_id, *args, **kwargs)
+            except Exception as exc:  # noqa: BLE001
+                try:
+                    record_collaboration_event(
+                        session_id=session_id,
+                        agent_name=agent_name,
+                        event_type="error",
+                        summary=f"{stage.capitalize()} failed: {exc}",
+                        artifact_refs=[stage],
+                    )
+                except Exception:  # noqa: BLE001
+                    pass
+                return {
+                    "session_id": session_id,
+                    "status": "failed",
+                    "stage": stage,
+                    "error": str(exc),
+                    "retryable": is_retryable_error(exc),
+                }
+
+        return wrapper
+
+    return decorator
+
 
 def register_session_courses(session_id: str, courses: list[dict[str, Any]]) -> dict[str, Any]:
     """Persist course IDs/names/midterm dates for the session."""
@@ -29,13 +81,15 @@ def register_session_files(session_id: str, files: list[dict[str, Any]]) -> dict
 
 
 def _slug(value: str) -> str:
-    value = re.sub(r"[^a-zA-Z0-9]+", "_", value.lower()).strip("_")
+    value = _SLUG_RE.sub("_", value.lower()).strip("_")
     return value or "course"
 
 
-def _course_tokens(course_name: str) -> set[str]:
-    parts = re.findall(r"[a-zA-Z0-9]+", course_name.lower())
-    return {p for p in parts if len(p) >= 4}
+@functools.lru_cache(maxsize=1024)
+def _course_tokens(course_name: str) -> frozenset[str]:
+    # Course names repeat across calls and sessions; tokenize each one once.
+    parts = _TOKEN_RE.findall(course_name.lower())
+    return frozenset(p for p in parts if len(p) >= 4)
 
 
 def _auto_mappings_from_registered_files(
@@ -46,21 +100,45 @@ def _auto_mappings_from_registered_files(
         c["course_id"]: _course_tokens(c["course_name"])
         for c in course_defs
     }
+    token_courses: defaultdict[str, set[str]] = defaultdict(set)
+    for course_id, tokens in course_token_map.items():
+        for tok in tokens:
+            token_courses[tok].add(course_id)
+    # One regex scans each filename for every token at once. The lookahead reports the
+    # longest token starting at each position; any shorter token matching there is a
+    # prefix of it, so each token carries the courses of all its token prefixes.
+    courses_for_hit = {
+        tok: set().union(*(ids for other, ids in token_courses.items() if tok.startswith(other)))
+        for tok in token_courses
+    }
+    matcher = (
+        re.compile(
+            "(?=("
+            + "|".join(re.escape(tok) for tok in sorted(token_courses, key=len, reverse=True))
+            + "))"
+        )
+        if token_courses
+        else None
+    )
+    # Courses without usable tokens can never match, so only these count toward "all matched".
+    matchable_count = len(set().union(*token_courses.values()))
     mappings: list[dict[str, Any]] = []
     for f in registered_files:
         filename = str(f.get("filename", "")).lower()
         file_id = str(f.get("file_id", "")).strip()
         if not file_id:
             continue
-        matched_course_ids: list[str] = []
-        for course_id, tokens in course_token_map.items():
-            if any(tok in filename for tok in tokens):
-                matched_course_ids.append(course_id)
+        matched_course_ids: set[str] = set()
+        if matcher is not None:
+            for match in matcher.finditer(filename):
+                matched_course_ids |= courses_for_hit[match.group(1)]
+                if len(matched_course_ids) == matchable_count:
+                    break
         if matched_course_ids:
             mappings.append(
                 {
                     "file_id": file_id,
-                    "course_ids": sorted(set(matched_course_ids)),
+                    "course_ids": sorted(matched_course_ids),
                     "is_shared": False,
                 }
             )
@@ -94,16 +172,19 @@ def run_simple_study_planner(
 
     course_defs: list[dict[str, str]] = []
     used_ids: set[str] = set()
+    # Next suffix to try per slug, so repeated names do not rescan suffixes already taken.
+    next_suffix: dict[str, int] = {}
     for idx, (name, midterm) in enumerate(zip(course_names, midterm_dates, strict=True)):
         course_name = str(name).strip()
         if not course_name:
             raise ValueError(f"course_names[{idx}] is empty.")
         base_id = _slug(course_name)
         course_id = base_id
-        suffix = 2
+        suffix = next_suffix.get(base_id, 2)
         while course_id in used_ids:
             course_id = f"{base_id}_{suffix}"
             suffix += 1
+        next_suffix[base_id] = suffix
         used_ids.add(course_id)
         course_defs.append(
             {
@@ -169,38 +250,24 @@ def map_session_files_to_courses(session_id: str, mappings: list[dict[str, Any]]
     return link_files_to_courses(session_id=session_id, mappings=mappings)
 
 
+@_stage("IngestionAgent", "ingestion")
 def ingest_session_documents(
     session_id: str,
-    max_pages_per_chunk: int = 20,
-    max_chars_per_chunk: int = 18000,
+    max_pages_per_chunk: int | None = None,
+    max_chars_per_chunk: int | None = None,
     force_reprocess: bool = False,
 ) -> dict[str, Any]:
-    """Process registered PDFs in chunks and extract topic evidence."""
-    try:
-        return run_ingestion(
-            session_id=session_id,
-            max_pages_per_chunk=max_pages_per_chunk,
-            max_chars_per_chunk=max_chars_per_chunk,
-            force_reprocess=force_reprocess,
-        )
-    except Exception as exc:  # noqa: BLE001
-        try:
-            record_collaboration_event(
-                session_id=session_id,
-                agent_name="IngestionAgent",
-                event_type="error",
-                summary=f"Ingestion failed: {exc}",
-                artifact_refs=["ingestion"],
-            )
-        except Exception:  # noqa: BLE001
-            pass
-        return {
-            "session_id": session_id,
-            "status": "failed",
-            "stage": "ingestion",
-            "error": str(exc),
-            "retryable": is_retryable_error(exc),
-        }
+    """
+    Process registered PDFs in chunks and extract topic evidence.
+
+    Chunk limits default to the INGESTION_MAX_CHUNK_* settings.
+    """
+    return run_ingestion(
+        session_id=session_id,
+        max_pages_per_chunk=max_pages_per_chunk,
+        max_chars_per_chunk=max_chars_per_chunk,
+        force_reprocess=force_reprocess,
+    )
 
 
 def read_ingestion_state(session_id: str) -> dict[str, Any]:
@@ -208,6 +275,7 @@ def read_ingestion_state(session_id: str) -> dict[str, Any]:
     return get_session_ingestion_state(session_id=session_id)
 
 
+@_stage("EstimationAgent", "estimation")
 def estimate_session_workload(
     session_id: str,
     min_minutes: int = 25,
@@ -215,31 +283,12 @@ def estimate_session_workload(
     force_reprocess: bool = False,
 ) -> dict[str, Any]:
     """Estimate topic-level study workload from normalized ingestion evidence."""
-    try:
-        return estimate_workload(
-            session_id=session_id,
-            min_minutes=min_minutes,
-            max_minutes=max_minutes,
-            force_reprocess=force_reprocess,
-        )
-    except Exception as exc:  # noqa: BLE001
-        try:
-            record_collaboration_event(
-                session_id=session_id,
-                agent_name="EstimationAgent",
-                event_type="error",
-                summary=f"Estimation failed: {exc}",
-                artifact_refs=["estimation"],
-            )
-        except Exception:  # noqa: BLE001
-            pass
-        return {
-            "session_id": session_id,
-            "status": "failed",
-            "stage": "estimation",
-            "error": str(exc),
-            "retryable": is_retryable_error(exc),
-        }
+    return estimate_workload(
+        session_id=session_id,
+        min_minutes=min_minutes,
+        max_minutes=max_minutes,
+        force_reprocess=force_reprocess,
+    )
 
 
 def read_estimation_state(session_id: str) -> dict[str, Any]:
@@ -247,6 +296,7 @@ def read_estimation_state(session_id: str) -> dict[str, Any]:
     return get_session_estimation_state(session_id=session_id)
 
 
+@_stage("PlanningReviewerAgent", "planning")
 def build_session_study_plan(
     session_id: str,
     daily_study_cap_minutes: int = 240,
@@ -255,32 +305,13 @@ def build_session_study_plan(
     force_reprocess: bool = False,
 ) -> dict[str, Any]:
     """Build day-by-day study allocations from today through the last midterm."""
-    try:
-        return build_schedule_plan(
-            session_id=session_id,
-            daily_study_cap_minutes=daily_study_cap_minutes,
-            min_block_minutes=min_block_minutes,
-            max_block_minutes=max_block_minutes,
-            force_reprocess=force_reprocess,
-        )
-    except Exception as exc:  # noqa: BLE001
-        try:
-            record_collaboration_event(
-                session_id=session_id,
-                agent_name="PlanningReviewerAgent",
-                event_type="error",
-                summary=f"Planning failed: {exc}",
-                artifact_refs=["planning"],
-            )
-        except Exception:  # noqa: BLE001
-            pass
-        return {
-            "session_id": session_id,
-            "status": "failed",
-            "stage": "planning",
-            "error": str(exc),
-            "retryable": is_retryable_error(exc),
-        }
+    return build_schedule_plan(
+        session_id=session_id,
+        daily_study_cap_minutes=daily_study_cap_minutes,
+        min_block_minutes=min_block_minutes,
+        max_block_minutes=max_block_minutes,
+        force_reprocess=force_reprocess,
+    )
 
 
 def read_planning_state(session_id: str) -> dict[str, Any]:
@@ -288,6 +319,7 @@ def read_planning_state(session_id: str) -> dict[str, Any]:
     return get_session_planning_state(session_id=session_id)
 
 
+@_stage("PlanningReviewerAgent", "review")
 def review_session_plan(
     session_id: str,
     daily_study_cap_minutes: int = 240,
@@ -295,31 +327,12 @@ def review_session_plan(
     max_revision_rounds: int = 1,
 ) -> dict[str, Any]:
     """Validate plan and return approved_plan, capacity_limited_plan, or needs_revision."""
-    try:
-        return review_and_finalize_plan(
-            session_id=session_id,
-            daily_study_cap_minutes=daily_study_cap_minutes,
-            allow_auto_revision=allow_auto_revision,
-            max_revision_rounds=max_revision_rounds,
-        )
-    except Exception as exc:  # noqa: BLE001
-        try:
-            record_collaboration_event(
-                session_id=session_id,
-                agent_name="PlanningReviewerAgent",
-                event_type="error",
-                summary=f"Review failed: {exc}",
-                artifact_refs=["review"],
-            )
-        except Exception:  # noqa: BLE001
-            pass
-        return {
-            "session_id": session_id,
-            "status": "failed",
-            "stage": "review",
-            "error": str(exc),
-            "retryable": is_retryable_error(exc),
-        }
+    return review_and_finalize_plan(
+        session_id=session_id,
+        daily_study_cap_minutes=daily_study_cap_minutes,
+        allow_auto_revision=allow_auto_revision,
+        max_revision_rounds=max_revision_rounds,
+    )
 
 
 def record_session_collaboration_event(
@@ -339,6 +352,18 @@ def record_session_collaboration_event(
     )
 
 
+def record_session_collaboration_events(
+    session_id: str,
+    events: list[dict[str, Any]],
+) -> dict[str, Any]:
+    """
+    Record several collaboration events in one call.
+
+    Each event needs agent_name, event_type, and summary; artifact_refs is optional.
+    """
+    return record_collaboration_events(session_id=session_id, events=events)
+
+
 def read_session_collaboration_trace(
     session_id: str,
     limit: int = 100,
@@ -352,33 +377,20 @@ def read_session_collaboration_trace(
     )
 
 
+@_stage("CoordinatorAgent", "export")
 def export_session_study_plan(
     session_id: str,
     overwrite: bool = True,
 ) -> dict[str, Any]:
     """Export deterministic study plan outputs to CSV and Markdown files."""
-    try:
-        return export_study_plan_outputs(session_id=session_id, overwrite=overwrite)
-    except Exception as exc:  # noqa: BLE001
-        try:
-            record_collaboration_event(
-                session_id=session_id,
-                agent_name="CoordinatorAgent",
-                event_type="error",
-                summary=f"Export failed: {exc}",
-                artifact_refs=["export"],
-            )
-        except Exception:  # noqa: BLE001
-            pass
-        return {
-            "session_id": session_id,
-            "status": "failed",
-            "stage": "export",
-            "error": str(exc),
-            "retryable": is_retryable_error(exc),
-        }
+    return export_study_plan_outputs(session_id=session_id, overwrite=overwrite)
 
 
 def read_session_output_artifacts(session_id: str) -> dict[str, Any]:
     """Read exported artifact paths/existence for the current session."""
     return read_output_artifacts(session_id=session_id)
+
+
+def read_planning_bundle(session_id: str, trace_limit: int = 100) -> dict[str, Any]:
+    """Read planning state, output artifacts, and collaboration trace in one call."""
+    return get_session_planning_bundle(session_id=session_id, trace_limit=trace_limit)